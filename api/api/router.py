@@ -1,9 +1,14 @@
 from fastapi import APIRouter
 
-from api.api.v1 import chat
+from api.api.v1 import artifacts, batches, chat, files, sessions, status
 
 
 api_router = APIRouter()
 
 
 api_router.include_router(chat.router, prefix="/v1", tags=["chat"])
+api_router.include_router(artifacts.router, prefix="/v1", tags=["artifacts"])
+api_router.include_router(files.router, prefix="/v1", tags=["files"])
+api_router.include_router(batches.router, prefix="/v1", tags=["batches"])
+api_router.include_router(sessions.router, prefix="/v1", tags=["sessions"])
+api_router.include_router(status.router, prefix="/v1", tags=["status"])
@@ -0,0 +1,203 @@
+import os
+import time
+import uuid
+import posixpath
+import aiofiles
+import asyncssh
+from contextlib import AsyncExitStack
+from typing import AsyncIterable, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from api.config.settings import settings
+from api.core.audit import audit_log
+from api.core.sandbox_pool import sandbox_pool
+from api.core.session_store import session_store
+from api.core.ssh_executor import AsyncSSHExecutor
+from api.utils.logger import logger
+
+
+router = APIRouter()
+
+
+def resolve_artifact_path(path: str) -> str:
+    root = settings.container_shared_data_path.rstrip("/")
+    resolved = posixpath.normpath(posixpath.join(root, path.lstrip("/")))
+    if not resolved.startswith(root + "/"):
+        raise HTTPException(status_code=400, detail="Path must stay inside the shared data directory")
+    return resolved
+
+
+def host_artifact_path(path: str) -> str:
+    relative = posixpath.relpath(resolve_artifact_path(path), settings.container_shared_data_path.rstrip("/"))
+    root = os.path.realpath(settings.host_shared_data_path)
+    resolved = os.path.realpath(os.path.join(root, relative))
+    if not resolved.startswith(root + os.sep):
+        raise HTTPException(status_code=400, detail="Path must stay inside the shared data directory")
+    return resolved
+
+
+def host_file_response(resolved: str, offset: int = 0, length: Optional[int] = None) -> Response:
+    if os.path.isdir(resolved):
+        raise HTTPException(status_code=400, detail="Path is a directory")
+    if not os.path.isfile(resolved):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    size = os.path.getsize(resolved)
+    headers = {"X-Artifact-Size": str(size)}
+    if offset <= 0 and length is None:
+        return FileResponse(resolved, filename=os.path.basename(resolved), headers=headers)
+
+    offset = min(max(offset, 0), size)
+    count = size - offset if length is None else min(max(length, 0), size - offset)
+
+    async def stream():
+        async with aiofiles.open(resolved, "rb") as file:
+            await file.seek(offset)
+            remaining = count
+            while remaining > 0:
+                chunk = await file.read(min(remaining, settings.sftp_chunk_size))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    headers.update({
+        "Content-Length": str(count),
+        "Content-Disposition": f'attachment; filename="{os.path.basename(resolved)}"'
+    })
+    return StreamingResponse(stream(), media_type="application/octet-stream", headers=headers)
+
+
+async def write_host_file(target: str, body: AsyncIterable[bytes]) -> int:
+    if os.path.isdir(target):
+        raise HTTPException(status_code=400, detail="Path is a directory")
+
+    started_at = time.perf_counter()
+    temporary = f"{target}.part-{uuid.uuid4().hex[:8]}"
+    written = 0
+    error = None
+
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        async with aiofiles.open(temporary, "wb") as file:
+            async for chunk in body:
+                await file.write(chunk)
+                written += len(chunk)
+        os.replace(temporary, target)
+    except BaseException as exception:
+        error = str(exception)
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        if isinstance(exception, PermissionError):
+            raise HTTPException(status_code=403, detail="Permission denied")
+        raise
+    finally:
+        audit_log.record(
+            "file",
+            request_id=None,
+            step=None,
+            operation="write",
+            path=target,
+            bytes=written,
+            duration_ms=round((time.perf_counter() - started_at) * 1000, 2),
+            error=error
+        )
+
+    return written
+
+
+async def open_executor(session_id: str) -> Tuple[AsyncExitStack, AsyncSSHExecutor]:
+    session = await session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    stack = AsyncExitStack()
+    try:
+        pool = await stack.enter_async_context(sandbox_pool.lease(session.id))
+        executor = await stack.enter_async_context(AsyncSSHExecutor(pool, cache=session.command_cache))
+    except BaseException:
+        await stack.aclose()
+        raise
+    return stack, executor
+
+
+def sftp_error(error: asyncssh.SFTPError) -> HTTPException:
+    if isinstance(error, (asyncssh.SFTPNoSuchFile, asyncssh.SFTPNoSuchPath)):
+        return HTTPException(status_code=404, detail="Artifact not found")
+    if isinstance(error, asyncssh.SFTPFileIsADirectory):
+        return HTTPException(status_code=400, detail="Path is a directory")
+    if isinstance(error, asyncssh.SFTPPermissionDenied):
+        return HTTPException(status_code=403, detail="Permission denied")
+    return HTTPException(status_code=500, detail=f"SFTP error: {error.reason}")
+
+
+@router.put("/artifacts/{path:path}")
+async def upload_artifact(path: str, request: Request, session_id: Optional[str] = None):
+    remote_path = resolve_artifact_path(path)
+    limit = settings.artifact_max_upload_bytes
+
+    declared = request.headers.get("content-length")
+    if limit and declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Artifact exceeds the {limit} byte limit")
+
+    async def body():
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if limit and received > limit:
+                raise HTTPException(status_code=413, detail=f"Artifact exceeds the {limit} byte limit")
+            yield chunk
+
+    if session_id is None:
+        written = await write_host_file(host_artifact_path(path), body())
+    else:
+        stack, executor = await open_executor(session_id)
+        async with stack:
+            try:
+                written = await executor.write_file(remote_path, body())
+            except asyncssh.SFTPError as error:
+                raise sftp_error(error)
+
+    logger.info(f"Uploaded artifact {remote_path} ({written} bytes)")
+    return {"path": remote_path, "bytes": written}
+
+
+@router.get("/artifacts/{path:path}")
+async def download_artifact(path: str, session_id: Optional[str] = None, offset: int = 0, length: Optional[int] = None):
+    if session_id is None:
+        return host_file_response(host_artifact_path(path), offset, length)
+
+    remote_path = resolve_artifact_path(path)
+    stack, executor = await open_executor(session_id)
+
+    try:
+        size = await executor.file_size(remote_path)
+    except BaseException as error:
+        await stack.aclose()
+        if isinstance(error, asyncssh.SFTPError):
+            raise sftp_error(error)
+        raise
+
+    offset = min(max(offset, 0), size)
+    count = size - offset if length is None else min(max(length, 0), size - offset)
+
+    async def stream():
+        async with stack:
+            async for chunk in executor.iter_file(remote_path, offset, count):
+                yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/octet-stream",
+        headers={
+            "Content-Length": str(count),
+            "Content-Disposition": f'attachment; filename="{posixpath.basename(remote_path)}"',
+            "X-Artifact-Size": str(size)
+        },
+        background=BackgroundTask(stack.aclose)
+    )
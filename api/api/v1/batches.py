@@ -0,0 +1,71 @@
+import os
+import aiofiles
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from api.core.batch_scheduler import batch_scheduler
+
+
+router = APIRouter()
+
+
+@router.post("/batches")
+async def create_batch(request: Request, concurrency: Optional[int] = None):
+    body = await request.body()
+
+    try:
+        batch = await batch_scheduler.create(body.decode("utf-8"), concurrency)
+    except (ValueError, UnicodeDecodeError) as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    return batch.to_dict()
+
+
+@router.get("/batches")
+async def list_batches():
+    return {"object": "list", "data": [batch.to_dict() for batch in batch_scheduler.list()]}
+
+
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    batch = batch_scheduler.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch.to_dict()
+
+
+@router.get("/batches/{batch_id}/output")
+async def get_batch_output(batch_id: str, offset: int = 0):
+    batch = batch_scheduler.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    async with batch.output_lock:
+        size = os.path.getsize(batch.output_path) if os.path.exists(batch.output_path) else 0
+
+    async def stream_output():
+        async with aiofiles.open(batch.output_path, "rb") as file:
+            await file.seek(min(max(offset, 0), size))
+            remaining = size - await file.tell()
+            while remaining > 0:
+                chunk = await file.read(min(remaining, 64 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return StreamingResponse(
+        stream_output(),
+        media_type="application/x-ndjson",
+        headers={"X-Next-Offset": str(size), "X-Batch-Status": batch.status}
+    )
+
+
+@router.post("/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    batch = await batch_scheduler.cancel(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch.to_dict()
@@ -1,8 +1,12 @@
-from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.background import BackgroundTask
 
 from api.utils.types import ChatCompletionRequest
+from api.core.admission import admission, AdmissionRejected
 from api.core.llm_gateway import llm_gateway
+from api.core.metrics import metrics
+from api.core.session_store import session_store
 from api.utils.logger import logger
 
 
@@ -10,10 +14,45 @@ router = APIRouter()
 
 
 @router.post("/chat/completions")
-async def create_chat_completion(request: ChatCompletionRequest):
+async def create_chat_completion(request: ChatCompletionRequest, http_request: Request):
     logger.info(f"Received chat completion request for model {request.model}")
 
+    session = None
+    if request.session_id:
+        session = await session_store.get(request.session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    try:
+        ticket = await admission.acquire()
+    except AdmissionRejected as rejection:
+        raise HTTPException(
+            status_code=rejection.status_code,
+            detail=rejection.reason,
+            headers={"Retry-After": str(rejection.retry_after)}
+        )
+
+    if not request.stream:
+        try:
+            with metrics.track_request():
+                completion = await llm_gateway.complete(request, session, http_request.is_disconnected)
+        finally:
+            ticket.release()
+
+        return JSONResponse(
+            content=completion.model_dump(mode="json", exclude_none=True),
+            headers={"X-Session-Id": session.id} if session else None
+        )
+
+    body = ticket.guard(metrics.track_stream(llm_gateway.process_request(request, session, http_request.is_disconnected)))
+
+    async def finish() -> None:
+        await body.aclose()
+        ticket.release()
+
     return StreamingResponse(
-        llm_gateway.process_request(request),
-        media_type="text/event-stream"
+        body,
+        media_type="text/event-stream",
+        headers={"X-Session-Id": session.id} if session else None,
+        background=BackgroundTask(finish)
     )
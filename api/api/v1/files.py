@@ -0,0 +1,67 @@
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from api.api.v1.artifacts import host_artifact_path, host_file_response
+from api.config.settings import settings
+from api.core.file_index import IndexedFile, file_index
+
+
+router = APIRouter()
+
+
+def file_entry(entry: IndexedFile, digests: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
+    data = {
+        "path": entry.path,
+        "object": "file",
+        "size": entry.size,
+        "modified_at": entry.mtime_ns / 1e9
+    }
+    if digests is not None:
+        data["sha256"] = digests.get(entry.path)
+    return data
+
+
+@router.get("/files")
+async def list_files(
+    path: str = "",
+    glob: Optional[str] = None,
+    modified_after: Optional[float] = None,
+    modified_before: Optional[float] = None,
+    min_size: Optional[int] = None,
+    max_size: Optional[int] = None,
+    sort: str = "path",
+    limit: int = 100,
+    offset: int = 0,
+    include_hash: bool = Query(False, alias="hash"),
+    refresh: bool = False
+):
+    if not file_index.enabled:
+        raise HTTPException(status_code=404, detail="File index is disabled")
+
+    if refresh:
+        await file_index.refresh()
+    else:
+        await file_index.ensure_ready()
+
+    try:
+        matches = file_index.list(path, glob, modified_after, modified_before, min_size, max_size, sort)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    offset = max(offset, 0)
+    page = matches[offset:offset + min(max(limit, 1), settings.file_index_max_page_size)]
+    digests = await file_index.digests(page) if include_hash else None
+
+    return {
+        "object": "list",
+        "data": [file_entry(entry, digests) for entry in page],
+        "total": len(matches),
+        "has_more": offset + len(page) < len(matches),
+        "indexed_at": file_index.indexed_at
+    }
+
+
+@router.get("/files/{path:path}")
+async def download_file(path: str):
+    return host_file_response(host_artifact_path(path))
@@ -1,10 +1,145 @@
 import json
-from typing import Any
+from json.encoder import encode_basestring_ascii
+from typing import Any, Dict, List, Optional
+
+from api.utils.types import (
+    Role,
+    ChatCompletion,
+    ChatCompletionChoice,
+    ChatCompletionChunk,
+    ChatCompletionChunkChoice,
+    ChatCompletionChunkDelta,
+    ChatCompletionMessageParam,
+    CommandExecution,
+    CompletionUsage
+)
+
+
+SSE_DONE = "data: [DONE]\n\n"
 
 
 def create_sse_event(data: Any) -> str:
     if data == "[DONE]":
-        return "data: [DONE]\n\n"
+        return SSE_DONE
 
     payload = json.dumps(data.model_dump(exclude_none=True))
     return f"data: {payload}\n\n"
+
+
+class ChunkSerializer:
+    def __init__(self, request_id: str, created: int, model: str):
+        self.request_id = request_id
+        self.created = created
+        self.model = model
+
+        header = (
+            f'data: {{"id": {encode_basestring_ascii(request_id)}, "object": "chat.completion.chunk", '
+            f'"created": {created}, "model": {encode_basestring_ascii(model)}, "choices": [{{"index": 0, "delta": {{'
+        )
+
+        self._content_prefix = header + '"role": "assistant", "content": '
+        self._command_output_prefix = header + '"command_output": '
+        self._tool_call_id_infix = ', "tool_call_id": '
+        self._suffix = "}}]}\n\n"
+
+    def content(self, text: str) -> str:
+        return self._content_prefix + encode_basestring_ascii(text) + self._suffix
+
+    def command_output(self, text: str, tool_call_id: Optional[str] = None) -> str:
+        if tool_call_id is None:
+            return self._command_output_prefix + encode_basestring_ascii(text) + self._suffix
+        return (
+            self._command_output_prefix + encode_basestring_ascii(text)
+            + self._tool_call_id_infix + encode_basestring_ascii(tool_call_id) + self._suffix
+        )
+
+    def command_started(self, command: str, tool_call_id: Optional[str] = None) -> str:
+        return self.command_output(f"> {command}", tool_call_id)
+
+    def command_chunk(self, data: str, tool_call_id: Optional[str] = None) -> str:
+        return self.command_output("| " + data, tool_call_id)
+
+    def command_result(self, result: Any, tool_call_id: Optional[str] = None) -> str:
+        return self.command_output("< " + (result.stdout or result.stderr), tool_call_id)
+
+    def error(self, message: str) -> str:
+        delta = ChatCompletionChunkDelta(content=f"\n**System Error**: {message}")
+        chunk = ChatCompletionChunk(
+            id=self.request_id, created=self.created, model=self.model,
+            choices=[ChatCompletionChunkChoice(index=0, delta=delta, finish_reason="stop")]
+        )
+        return create_sse_event(chunk)
+
+    def add_usage(self, usage: Any) -> None:
+        pass
+
+    @staticmethod
+    def done() -> str:
+        return SSE_DONE
+
+
+class CompletionAggregator:
+    def __init__(self, request_id: str, created: int, model: str):
+        self.request_id = request_id
+        self.created = created
+        self.model = model
+
+        self.finish_reason: Optional[str] = None
+        self.error_message: Optional[str] = None
+        self.usage = CompletionUsage()
+        self.commands: List[CommandExecution] = []
+
+        self._content_parts: List[str] = []
+        self._commands_by_id: Dict[str, CommandExecution] = {}
+
+    def content(self, text: str) -> None:
+        self._content_parts.append(text)
+
+    def command_output(self, text: str, tool_call_id: Optional[str] = None) -> None:
+        return None
+
+    def command_started(self, command: str, tool_call_id: Optional[str] = None) -> None:
+        execution = CommandExecution(tool_call_id=tool_call_id, command=command)
+        self.commands.append(execution)
+        if tool_call_id:
+            self._commands_by_id[tool_call_id] = execution
+
+    def command_chunk(self, data: str, tool_call_id: Optional[str] = None) -> None:
+        return None
+
+    def command_result(self, result: Any, tool_call_id: Optional[str] = None) -> None:
+        execution = self._commands_by_id.get(tool_call_id) if tool_call_id else None
+        if execution is None:
+            execution = CommandExecution(tool_call_id=tool_call_id)
+            self.commands.append(execution)
+
+        execution.exit_code = result.exit_code
+        execution.stdout = result.stdout
+        execution.stderr = result.stderr
+
+    def error(self, message: str) -> None:
+        self.error_message = message
+        self._content_parts.append(f"\n**System Error**: {message}")
+        self.finish_reason = "stop"
+
+    def add_usage(self, usage: Any) -> None:
+        self.usage.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        self.usage.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+        self.usage.total_tokens = self.usage.prompt_tokens + self.usage.completion_tokens
+
+    def done(self) -> None:
+        self.finish_reason = "stop"
+
+    def build(self) -> ChatCompletion:
+        return ChatCompletion(
+            id=self.request_id,
+            created=self.created,
+            model=self.model,
+            choices=[ChatCompletionChoice(
+                index=0,
+                message=ChatCompletionMessageParam(role=Role.ASSISTANT, content="".join(self._content_parts)),
+                finish_reason=self.finish_reason
+            )],
+            usage=self.usage,
+            commands=self.commands
+        )
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+
+from api.core.session_store import session_store
+
+
+router = APIRouter()
+
+
+@router.post("/sessions")
+async def create_session():
+    session = await session_store.create()
+    return session.stats()
+
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str, include_messages: bool = False):
+    session = await session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    response = session.stats()
+    if include_messages:
+        response["messages"] = session.messages
+    return response
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not await session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"id": session_id, "deleted": True}
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+
+from api.core.admission import admission
+from api.core.audit import audit_log
+from api.core.batch_scheduler import batch_scheduler
+from api.core.command_cache import command_cache
+from api.core.file_index import file_index
+from api.core.prompt_cache import prompt_cache
+from api.core.sandbox_pool import sandbox_pool
+from api.core.session_store import session_store
+from api.core.ssh_executor import ssh_pool
+from api.core.upstream import upstream
+
+
+router = APIRouter()
+
+
+@router.get("/status")
+async def get_status():
+    return {
+        "admission": admission.stats(),
+        "upstream": upstream.stats(),
+        "ssh_pool": ssh_pool.stats(),
+        "sandbox_pool": sandbox_pool.stats(),
+        "sessions": session_store.stats(),
+        "audit_log": audit_log.stats(),
+        "prompt_cache": prompt_cache.stats(),
+        "command_cache": command_cache.stats(),
+        "batches": batch_scheduler.stats(),
+        "file_index": file_index.stats()
+    }
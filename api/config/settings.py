@@ -7,20 +7,116 @@ class Settings(BaseSettings):
     debug_mode: bool = False
 
     openrouter_api_key: str
+    openrouter_base_url: str = "https://openrouter.ai/api/v1"
     openrouter_model: str = "google/gemini-3-flash-preview"
+
+    upstream_max_connections: int = 100
+    upstream_max_keepalive_connections: int = 20
+    upstream_keepalive_expiry: float = 60.0
+    upstream_http2: bool = True
+    upstream_connect_timeout: float = 10.0
+    upstream_read_timeout: float = 600.0
+    upstream_max_retries: int = 3
+    upstream_retry_base_delay: float = 0.5
+    upstream_retry_max_delay: float = 8.0
+    upstream_hedge_enabled: bool = False
+    upstream_hedge_percentile: float = 95.0
+    upstream_hedge_min_delay: float = 1.0
+    upstream_hedge_min_samples: int = 20
+
     max_agent_steps: int = 25
+    max_parallel_tool_calls: int = 4
+    speculative_tool_calls: bool = True
+    disconnect_poll_interval: float = 1.0
+
+    admission_max_in_flight: int = 16
+    admission_queue_size: int = 32
+    admission_queue_timeout: float = 30.0
+
+    context_max_tokens: int = 64000
+    context_tool_output_max_chars: int = 8000
+    context_keep_recent_steps: int = 3
+
+    session_ttl: float = 3600.0
+    session_max_count: int = 1000
+    session_max_messages: int = 500
+
+    stream_coalesce_max_window_ms: float = 250.0
+    stream_coalesce_max_bytes: int = 2048
+
+    prompt_cache_mode: str = "auto"
+    prompt_cache_model_prefixes: str = "anthropic/,google/gemini"
+
+    command_cache_enabled: bool = False
+    command_cache_ttl: float = 120.0
+    command_cache_max_entries: int = 256
+    command_cache_allowlist: str = (
+        "ls,cat,head,tail,wc,stat,file,grep,pwd,whoami,id,uname,hostname,which,printenv,"
+        "md5sum,sha256sum,pip list,pip show,pip freeze,python --version,python3 --version"
+    )
 
     ssh_host: str = "127.0.0.1"
     ssh_port: int = 2222
     ssh_username: str = "root"
     ssh_password: str
+    ssh_pool_min_size: int = 1
+    ssh_pool_max_size: int = 10
+    ssh_pool_idle_timeout: float = 300.0
+    ssh_pool_acquire_timeout: float = 30.0
+    ssh_keepalive_interval: float = 15.0
+
+    sandbox_pool_enabled: bool = False
+    sandbox_image: str = "interactive-ai-env"
+    sandbox_name_prefix: str = "interactive-ai-sandbox"
+    sandbox_pool_warm_size: int = 2
+    sandbox_pool_max_size: int = 8
+    sandbox_base_port: int = 2300
+    sandbox_idle_timeout: float = 600.0
+    sandbox_session_idle_timeout: float = 1800.0
+    sandbox_start_timeout: float = 60.0
+    sandbox_acquire_timeout: float = 120.0
 
     host_shared_data_path: str = "./shared_data"
     container_shared_data_path: str = "/root/data"
 
+    persistent_shell_enabled: bool = False
+    persistent_shell_interrupt_grace: float = 5.0
+
+    command_output_head_chars: int = 8192
+    command_output_tail_chars: int = 8192
+    command_output_spill_enabled: bool = True
+    command_output_spill_dir: str = ".spill"
+    command_output_spill_max_age: float = 86400.0
+
+    file_index_enabled: bool = True
+    file_index_refresh_interval: float = 5.0
+    file_index_full_rescan_interval: float = 300.0
+    file_index_max_page_size: int = 1000
+
+    sftp_chunk_size: int = 256 * 1024
+    sftp_read_max_bytes: int = 256 * 1024
+    artifact_max_upload_bytes: int = 2 * 1024 * 1024 * 1024
+
     log_level: str = "INFO"
     log_file: str = "logs/interactive_ai.log"
 
+    metrics_enabled: bool = True
+
+    batch_dir: str = "batches"
+    batch_max_concurrency: int = 4
+    batch_max_tasks: int = 10000
+    batch_requests_per_minute: float = 0.0
+    batch_max_retries: int = 2
+    batch_task_timeout: float = 1800.0
+
+    audit_log_file: str = "logs/audit.jsonl"
+    audit_log_max_bytes: int = 10 * 1024 * 1024
+    audit_log_rotation_interval: float = 86400.0
+    audit_log_backup_count: int = 10
+    audit_queue_size: int = 10000
+    audit_batch_size: int = 256
+    audit_preview_length: int = 200
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
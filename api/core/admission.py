@@ -0,0 +1,156 @@
+import math
+import asyncio
+from collections import deque
+from contextlib import aclosing
+from typing import Deque, Dict, Any, AsyncIterator
+
+from api.config.settings import settings
+from api.core.metrics import metrics
+from api.utils.logger import logger
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+        self.admitted_at = asyncio.get_running_loop().time()
+        self.released = False
+
+    def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        self.controller._release(asyncio.get_running_loop().time() - self.admitted_at)
+
+    async def guard(self, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+        try:
+            async with aclosing(stream):
+                async for chunk in stream:
+                    yield chunk
+        finally:
+            self.release()
+
+
+class AdmissionController:
+    def __init__(self):
+        self.max_in_flight = settings.admission_max_in_flight
+        self.max_queue = max(settings.admission_queue_size, 0)
+        self.queue_timeout = settings.admission_queue_timeout
+
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._average_hold = 0.0
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        if not self._average_hold or not self.enabled:
+            return 1
+        estimate = self._average_hold * (len(self._waiters) + 1) / self.max_in_flight
+        return min(max(math.ceil(estimate), 1), 60)
+
+    async def acquire(self) -> AdmissionTicket:
+        if not self.enabled or (self._in_flight < self.max_in_flight and not self._waiters):
+            self._in_flight += 1
+            return self._admit(0.0)
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            metrics.admission_rejected.labels("queue_full").inc()
+            logger.warning(f"Admission rejected: {self._in_flight} in flight, queue full ({len(self._waiters)})")
+            raise AdmissionRejected(429, "Too many concurrent requests, queue is full", self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        metrics.admission_queue_depth.set(len(self._waiters))
+        enqueued_at = loop.time()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return self._admit(loop.time() - enqueued_at)
+            self._discard(waiter)
+            self.rejected_timeout += 1
+            metrics.admission_rejected.labels("queue_timeout").inc()
+            logger.warning(f"Admission rejected: waited {self.queue_timeout}s in queue")
+            raise AdmissionRejected(503, "Server is overloaded, timed out waiting in queue", self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._in_flight -= 1
+                self._wake_next()
+            else:
+                self._discard(waiter)
+            raise
+
+        return self._admit(loop.time() - enqueued_at)
+
+    def _admit(self, waited: float) -> AdmissionTicket:
+        self.admitted += 1
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+        metrics.admission_wait.observe(waited)
+        return AdmissionTicket(self)
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        metrics.admission_queue_depth.set(len(self._waiters))
+
+    def _wake_next(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+                break
+        metrics.admission_queue_depth.set(len(self._waiters))
+
+    def _release(self, held: float) -> None:
+        self._average_hold = held if not self._average_hold else 0.8 * self._average_hold + 0.2 * held
+        self._in_flight -= 1
+        self._wake_next()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_time_avg_ms": round(self.wait_time_total / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "wait_time_max_ms": round(self.wait_time_max * 1000, 2),
+            "average_hold_s": round(self._average_hold, 3)
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import asyncio
+import aiofiles
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from api.config.settings import settings
+from api.utils.logger import logger
+
+
+class AuditLogger:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.audit_log_file
+        self.max_bytes = settings.audit_log_max_bytes
+        self.rotation_interval = settings.audit_log_rotation_interval
+        self.backup_count = settings.audit_log_backup_count
+        self.batch_size = settings.audit_batch_size
+        self.preview_length = settings.audit_preview_length
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.audit_queue_size)
+        self._writer_task: Optional[asyncio.Task] = None
+        self._file = None
+        self._file_size = 0
+        self._file_opened_at = 0.0
+
+        self.records_written = 0
+        self.records_dropped = 0
+        self.batches_written = 0
+        self.rotations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "written": self.records_written,
+            "dropped": self.records_dropped,
+            "batches": self.batches_written,
+            "rotations": self.rotations
+        }
+
+    def preview(self, text: str) -> str:
+        return text[:self.preview_length]
+
+    def record(self, event: str, **fields: Any) -> None:
+        entry = {"timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "event": event, **fields}
+
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.records_dropped += 1
+            if self.records_dropped % 1000 == 1:
+                logger.warning(f"Audit queue is full, dropped {self.records_dropped} records so far")
+
+    def start(self) -> None:
+        self._ensure_writer()
+
+    async def close(self) -> None:
+        if self._writer_task:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+
+        while not self._queue.empty():
+            await self._write_batch(self._drain())
+        await self._close_file()
+
+    def _ensure_writer(self) -> None:
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer_loop())
+
+    def _drain(self, first: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _writer_loop(self) -> None:
+        while True:
+            first = await self._queue.get()
+            batch = self._drain(first)
+            try:
+                await self._write_batch(batch)
+            except Exception as error:
+                self.records_dropped += len(batch)
+                logger.warning(f"Failed to write audit log: {error}")
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch)
+
+        await self._rotate_if_needed(len(data.encode("utf-8")))
+        if self._file is None:
+            await self._open_file()
+
+        await self._file.write(data)
+        await self._file.flush()
+
+        self._file_size += len(data.encode("utf-8"))
+        self.records_written += len(batch)
+        self.batches_written += 1
+
+    async def _open_file(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._file = await aiofiles.open(self.path, mode="a", encoding="utf-8")
+        self._file_size = os.path.getsize(self.path)
+        self._file_opened_at = time.time()
+
+    async def _close_file(self) -> None:
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+
+    async def _rotate_if_needed(self, incoming_bytes: int) -> None:
+        if self._file is None:
+            return
+
+        too_large = self.max_bytes > 0 and self._file_size + incoming_bytes > self.max_bytes
+        too_old = self.rotation_interval > 0 and time.time() - self._file_opened_at > self.rotation_interval
+        if not (too_large or too_old) or self._file_size == 0:
+            return
+
+        await self._close_file()
+
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+        self.rotations += 1
+        logger.info(f"Rotated audit log {self.path}")
+
+
+audit_log = AuditLogger()
@@ -0,0 +1,406 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import aiofiles
+from collections import deque
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional, NamedTuple
+
+from pydantic import ValidationError
+
+from api.api.v1.responses import CompletionAggregator
+from api.config.settings import settings
+from api.core.admission import admission, AdmissionRejected, AdmissionTicket
+from api.core.llm_gateway import llm_gateway
+from api.core.metrics import metrics
+from api.utils.types import ChatCompletionRequest
+from api.utils.logger import logger
+
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class BatchTask(NamedTuple):
+    custom_id: str
+    body: Dict[str, Any]
+
+
+class Batch:
+    def __init__(self, batch_id: str, directory: str, total: int, concurrency: int):
+        self.id = batch_id
+        self.directory = directory
+        self.total = total
+        self.concurrency = concurrency
+
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+        self.duration_total_ms = 0.0
+        self.duration_max_ms = 0.0
+
+        self.runner: Optional[asyncio.Task] = None
+        self.output_lock = asyncio.Lock()
+
+    @property
+    def input_path(self) -> str:
+        return os.path.join(self.directory, "input.jsonl")
+
+    @property
+    def output_path(self) -> str:
+        return os.path.join(self.directory, "output.jsonl")
+
+    @property
+    def metadata_path(self) -> str:
+        return os.path.join(self.directory, "batch.json")
+
+    def to_dict(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "id": self.id,
+            "object": "batch",
+            "status": self.status,
+            "created_at": int(self.created_at),
+            "started_at": int(self.started_at) if self.started_at else None,
+            "finished_at": int(self.finished_at) if self.finished_at else None,
+            "concurrency": self.concurrency,
+            "request_counts": {
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "running": self.running,
+                "pending": self.total - finished - self.running
+            },
+            "timing": {
+                "avg_task_ms": round(self.duration_total_ms / finished, 2) if finished else 0.0,
+                "max_task_ms": round(self.duration_max_ms, 2)
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, directory: str, data: Dict[str, Any]) -> "Batch":
+        batch = cls(data["id"], directory, data["request_counts"]["total"], data["concurrency"])
+        batch.status = data["status"]
+        batch.created_at = data["created_at"]
+        batch.started_at = data.get("started_at")
+        batch.finished_at = data.get("finished_at")
+        return batch
+
+
+class BatchScheduler:
+    def __init__(self):
+        self.directory = settings.batch_dir
+        self.max_concurrency = max(settings.batch_max_concurrency, 1)
+        self.max_tasks = settings.batch_max_tasks
+        self.requests_per_minute = settings.batch_requests_per_minute
+        self.max_retries = settings.batch_max_retries
+        self.task_timeout = settings.batch_task_timeout
+
+        self._batches: Dict[str, Batch] = {}
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._next_start = 0.0
+        self._closing = False
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for batch in self._batches.values():
+            statuses[batch.status] = statuses.get(batch.status, 0) + 1
+        return {
+            "batches": len(self._batches),
+            "statuses": statuses,
+            "running_tasks": sum(batch.running for batch in self._batches.values()),
+            "max_concurrency": self.max_concurrency
+        }
+
+    async def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+        for batch_id in sorted(os.listdir(self.directory)):
+            directory = os.path.join(self.directory, batch_id)
+            metadata_path = os.path.join(directory, "batch.json")
+            if not os.path.isfile(metadata_path):
+                continue
+
+            try:
+                async with aiofiles.open(metadata_path, "r", encoding="utf-8") as file:
+                    batch = Batch.from_dict(directory, json.loads(await file.read()))
+            except (OSError, ValueError, KeyError) as error:
+                logger.error(f"Skipping unreadable batch {batch_id}: {error}")
+                continue
+
+            self._batches[batch.id] = batch
+            pending = await self._pending_tasks(batch)
+
+            if batch.status == "cancelling":
+                await self._finish(batch, "cancelled")
+            elif batch.status in ACTIVE_STATUSES:
+                logger.info(f"Resuming batch {batch.id}: {len(pending)}/{batch.total} tasks left")
+                batch.runner = asyncio.create_task(self._run(batch, pending))
+
+    async def close(self) -> None:
+        self._closing = True
+        runners = [batch.runner for batch in self._batches.values() if batch.runner and not batch.runner.done()]
+        for runner in runners:
+            runner.cancel()
+        await asyncio.gather(*runners, return_exceptions=True)
+
+    def get(self, batch_id: str) -> Optional[Batch]:
+        return self._batches.get(batch_id)
+
+    def list(self) -> List[Batch]:
+        return sorted(self._batches.values(), key=lambda batch: batch.created_at, reverse=True)
+
+    def parse(self, text: str) -> List[BatchTask]:
+        tasks: List[BatchTask] = []
+        seen = set()
+
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+
+            try:
+                item = json.loads(line)
+            except ValueError as error:
+                raise ValueError(f"Line {line_number}: invalid JSON ({error})")
+            if not isinstance(item, dict):
+                raise ValueError(f"Line {line_number}: expected a JSON object")
+
+            if "body" in item:
+                custom_id, body = item.get("custom_id"), item["body"]
+            else:
+                custom_id, body = item.pop("custom_id", None), item
+
+            custom_id = str(custom_id) if custom_id is not None else f"task-{line_number}"
+            if custom_id in seen:
+                raise ValueError(f"Line {line_number}: duplicate custom_id '{custom_id}'")
+
+            try:
+                ChatCompletionRequest.model_validate(body)
+            except ValidationError as error:
+                raise ValueError(f"Line {line_number}: {error.errors()[0]['msg']}")
+
+            seen.add(custom_id)
+            tasks.append(BatchTask(custom_id, body))
+
+            if len(tasks) > self.max_tasks:
+                raise ValueError(f"Batch exceeds the limit of {self.max_tasks} tasks")
+
+        if not tasks:
+            raise ValueError("Batch contains no tasks")
+
+        return tasks
+
+    async def create(self, text: str, concurrency: Optional[int] = None) -> Batch:
+        tasks = self.parse(text)
+
+        batch_id = f"batch-{uuid.uuid4()}"
+        directory = os.path.join(self.directory, batch_id)
+        os.makedirs(directory, exist_ok=True)
+
+        batch = Batch(batch_id, directory, len(tasks), min(max(concurrency or self.max_concurrency, 1), self.max_concurrency))
+
+        async with aiofiles.open(batch.input_path, "w", encoding="utf-8") as file:
+            await file.write("".join(json.dumps({"custom_id": task.custom_id, "body": task.body}) + "\n" for task in tasks))
+        async with aiofiles.open(batch.output_path, "w", encoding="utf-8"):
+            pass
+        await self._save(batch)
+
+        self._batches[batch.id] = batch
+        batch.runner = asyncio.create_task(self._run(batch, tasks))
+        logger.info(f"Created batch {batch.id} with {batch.total} tasks (concurrency {batch.concurrency})")
+        return batch
+
+    async def cancel(self, batch_id: str) -> Optional[Batch]:
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            return None
+
+        if batch.status in ACTIVE_STATUSES:
+            batch.status = "cancelling"
+            if batch.runner and not batch.runner.done():
+                batch.runner.cancel()
+                await asyncio.gather(batch.runner, return_exceptions=True)
+            else:
+                await self._finish(batch, "cancelled")
+
+        return batch
+
+    async def _run(self, batch: Batch, tasks: List[BatchTask]) -> None:
+        batch.status = "running"
+        batch.started_at = batch.started_at or time.time()
+        await self._save(batch)
+
+        queue = deque(tasks)
+
+        async def worker() -> None:
+            while queue:
+                task = queue.popleft()
+                async with self._slots:
+                    await self._throttle()
+                    batch.running += 1
+                    try:
+                        record = await self._run_task(task)
+                    finally:
+                        batch.running -= 1
+                await self._record(batch, record)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(batch.concurrency, len(queue)))))
+        except asyncio.CancelledError:
+            if batch.status == "cancelling":
+                await self._finish(batch, "cancelled")
+            else:
+                await self._save(batch)
+            raise
+        except Exception as error:
+            logger.error(f"Batch {batch.id} failed: {error}")
+            await self._finish(batch, "failed")
+            return
+
+        await self._finish(batch, "completed")
+
+    async def _run_task(self, task: BatchTask) -> Dict[str, Any]:
+        request = ChatCompletionRequest.model_validate({**task.body, "stream": False, "session_id": None})
+        started_at = time.time()
+        timer = time.perf_counter()
+        aggregator = None
+        error = None
+        status_code = 200
+        attempts = 0
+
+        while attempts <= self.max_retries:
+            attempts += 1
+            aggregator = CompletionAggregator(f"chatcmpl-{uuid.uuid4()}", int(time.time()), llm_gateway.default_model)
+
+            ticket = await self._admit(task)
+            try:
+                await asyncio.wait_for(self._drive(request, aggregator), timeout=self.task_timeout)
+                error = aggregator.error_message
+                status_code = 502 if error else 200
+            except asyncio.TimeoutError:
+                error = f"Task timed out after {self.task_timeout}s"
+                status_code = 504
+                break
+            except Exception as exception:
+                error = f"{type(exception).__name__}: {exception}"
+                status_code = 500
+            finally:
+                ticket.release()
+
+            if error is None or aggregator.commands:
+                break
+
+            if attempts <= self.max_retries:
+                delay = min(2 ** attempts, 30)
+                logger.warning(f"Batch task {task.custom_id} failed before running commands, retrying in {delay}s: {error}")
+                await asyncio.sleep(delay)
+
+        duration_ms = (time.perf_counter() - timer) * 1000
+        metrics.batch_tasks.labels("failed" if error else "completed").inc()
+
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": task.custom_id,
+            "response": {"status_code": status_code, "body": aggregator.build().model_dump(mode="json", exclude_none=True)} if aggregator else None,
+            "error": {"message": error} if error else None,
+            "started_at": round(started_at, 3),
+            "duration_ms": round(duration_ms, 2),
+            "attempts": attempts
+        }
+
+    @staticmethod
+    async def _admit(task: BatchTask) -> AdmissionTicket:
+        while True:
+            try:
+                return await admission.acquire()
+            except AdmissionRejected as rejection:
+                logger.debug(f"Batch task {task.custom_id} waiting for admission ({rejection.reason}), retrying in {rejection.retry_after}s")
+                await asyncio.sleep(rejection.retry_after)
+
+    @staticmethod
+    async def _drive(request: ChatCompletionRequest, aggregator: CompletionAggregator) -> None:
+        async with aclosing(llm_gateway.process_request(request, serializer=aggregator)) as events:
+            async for _ in events:
+                pass
+
+    async def _record(self, batch: Batch, record: Dict[str, Any]) -> None:
+        async with batch.output_lock:
+            async with aiofiles.open(batch.output_path, "a", encoding="utf-8") as file:
+                await file.write(json.dumps(record) + "\n")
+
+            if record["error"]:
+                batch.failed += 1
+            else:
+                batch.completed += 1
+            batch.duration_total_ms += record["duration_ms"]
+            batch.duration_max_ms = max(batch.duration_max_ms, record["duration_ms"])
+
+            await self._save(batch)
+
+    async def _finish(self, batch: Batch, status: str) -> None:
+        batch.status = status
+        batch.finished_at = time.time()
+        await self._save(batch)
+        logger.info(f"Batch {batch.id} {status}: {batch.completed} completed, {batch.failed} failed")
+
+    async def _save(self, batch: Batch) -> None:
+        temporary_path = batch.metadata_path + ".tmp"
+        async with aiofiles.open(temporary_path, "w", encoding="utf-8") as file:
+            await file.write(json.dumps(batch.to_dict()))
+        os.replace(temporary_path, batch.metadata_path)
+
+    async def _pending_tasks(self, batch: Batch) -> List[BatchTask]:
+        done = set()
+
+        if os.path.exists(batch.output_path):
+            async with aiofiles.open(batch.output_path, "r+", encoding="utf-8") as file:
+                content = await file.read()
+                if content and not content.endswith("\n"):
+                    valid_length = content.rfind("\n") + 1
+                    logger.warning(f"Truncating partial record in {batch.output_path}")
+                    await file.truncate(len(content[:valid_length].encode("utf-8")))
+                    content = content[:valid_length]
+
+            for line in content.splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                done.add(record["custom_id"])
+                if record.get("error"):
+                    batch.failed += 1
+                else:
+                    batch.completed += 1
+                batch.duration_total_ms += record.get("duration_ms", 0.0)
+                batch.duration_max_ms = max(batch.duration_max_ms, record.get("duration_ms", 0.0))
+
+        pending = []
+        async with aiofiles.open(batch.input_path, "r", encoding="utf-8") as file:
+            async for line in file:
+                if line.strip():
+                    item = json.loads(line)
+                    if item["custom_id"] not in done:
+                        pending.append(BatchTask(item["custom_id"], item["body"]))
+
+        return pending
+
+    async def _throttle(self) -> None:
+        if self.requests_per_minute <= 0:
+            return
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start_at = max(now, self._next_start)
+        self._next_start = start_at + 60.0 / self.requests_per_minute
+
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+
+batch_scheduler = BatchScheduler()
@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterable, List, Optional
+
+from api.config.settings import settings
+
+
+class DeltaCoalescer:
+    def __init__(self, window_ms: float, max_bytes: Optional[int] = None):
+        self.window = min(window_ms, settings.stream_coalesce_max_window_ms) / 1000
+        self.max_bytes = max_bytes or settings.stream_coalesce_max_bytes
+
+        self._buffer: List[str] = []
+        self._size = 0
+        self._deadline: Optional[float] = None
+
+    def add(self, text: str) -> Optional[str]:
+        if not self._buffer:
+            self._deadline = asyncio.get_running_loop().time() + self.window
+
+        self._buffer.append(text)
+        self._size += len(text)
+
+        if self._size >= self.max_bytes:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        if not self._buffer:
+            return None
+
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._size = 0
+        self._deadline = None
+        return text
+
+    def time_until_flush(self) -> Optional[float]:
+        if self._deadline is None:
+            return None
+        return max(self._deadline - asyncio.get_running_loop().time(), 0)
+
+    async def iterate(self, stream: AsyncIterable[Any]) -> AsyncGenerator[Optional[Any], None]:
+        iterator = stream.__aiter__()
+        pending: Optional[asyncio.Future] = None
+
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+
+                done, _ = await asyncio.wait({pending}, timeout=self.time_until_flush())
+                if not done:
+                    yield None
+                    continue
+
+                completed, pending = pending, None
+                try:
+                    item = completed.result()
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            if pending is not None:
+                pending.cancel()
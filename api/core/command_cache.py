@@ -0,0 +1,231 @@
+import os
+import re
+import time
+import shlex
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, NamedTuple
+
+from api.config.settings import settings
+from api.core.metrics import metrics
+from api.utils.logger import logger
+
+
+SHELL_OPERATORS = re.compile(r"[;&<>`$(){}\n\\]|\|\|")
+MAX_PROBED_ENTRIES = 1000
+
+
+class _Environment:
+    def __init__(self):
+        self.epoch = 0
+        self.mutations_in_flight = 0
+
+
+class CacheEntry(NamedTuple):
+    result: Any
+    epoch: int
+    fingerprint: Optional[Tuple]
+    expires_at: float
+
+
+class CacheTicket(NamedTuple):
+    key: Tuple[str, str]
+    epoch: int
+    fingerprint: Optional[Tuple]
+    mutating: bool
+
+
+class CommandResultCache:
+    def __init__(self, owner: "CommandCache"):
+        self.owner = owner
+        self.entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self.pool: Optional[Any] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    def bind(self, pool: Any) -> None:
+        if pool is not self.pool:
+            self.entries.clear()
+            self.pool = pool
+
+    def invalidate(self) -> None:
+        self.owner.invalidate(self.owner.environment(self.pool))
+
+    def lookup(self, command: str, input_data: Optional[str]) -> Optional[Any]:
+        key = (command, input_data or "")
+        entry = self.entries.get(key)
+
+        if entry is None:
+            if self.owner.is_cacheable(command):
+                self._miss()
+            return None
+
+        environment = self.owner.environment(self.pool)
+        if (
+            entry.epoch != environment.epoch
+            or environment.mutations_in_flight
+            or entry.expires_at < time.monotonic()
+            or entry.fingerprint != self.owner.fingerprint(command)
+        ):
+            del self.entries[key]
+            self._miss()
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self.owner.hits += 1
+        metrics.command_cache_hits.inc()
+        return entry.result
+
+    def begin(self, command: str, input_data: Optional[str]) -> CacheTicket:
+        environment = self.owner.environment(self.pool)
+        key = (command, input_data or "")
+
+        if self.owner.is_cacheable(command):
+            return CacheTicket(key, environment.epoch, self.owner.fingerprint(command), False)
+
+        environment.mutations_in_flight += 1
+        self.owner.invalidate(environment)
+        return CacheTicket(key, environment.epoch, None, True)
+
+    def finish(self, ticket: Optional[CacheTicket], result: Optional[Any]) -> None:
+        if ticket is None:
+            return
+
+        environment = self.owner.environment(self.pool)
+
+        if ticket.mutating:
+            environment.mutations_in_flight -= 1
+            self.owner.invalidate(environment)
+            return
+
+        if (
+            result is None
+            or result.exit_code != 0
+            or ticket.epoch != environment.epoch
+            or environment.mutations_in_flight
+        ):
+            return
+
+        self.entries[ticket.key] = CacheEntry(result, ticket.epoch, ticket.fingerprint, time.monotonic() + self.owner.ttl)
+        self.entries.move_to_end(ticket.key)
+        self.owner.stores += 1
+
+        while len(self.entries) > self.owner.max_entries:
+            self.entries.popitem(last=False)
+
+    def _miss(self) -> None:
+        self.misses += 1
+        self.owner.misses += 1
+        metrics.command_cache_misses.inc()
+
+
+class CommandCache:
+    def __init__(self):
+        self.enabled = settings.command_cache_enabled
+        self.ttl = settings.command_cache_ttl
+        self.max_entries = max(settings.command_cache_max_entries, 1)
+        self.allowlist = tuple(prefix.strip() for prefix in settings.command_cache_allowlist.split(",") if prefix.strip())
+
+        self.container_root = settings.container_shared_data_path.rstrip("/")
+        self.host_root = os.path.abspath(settings.host_shared_data_path)
+
+        self._environments: "weakref.WeakKeyDictionary[Any, _Environment]" = weakref.WeakKeyDictionary()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "invalidations": self.invalidations
+        }
+
+    def scope(self) -> Optional[CommandResultCache]:
+        return CommandResultCache(self) if self.enabled else None
+
+    def environment(self, pool: Any) -> _Environment:
+        environment = self._environments.get(pool)
+        if environment is None:
+            environment = _Environment()
+            self._environments[pool] = environment
+        return environment
+
+    def invalidate(self, environment: _Environment) -> None:
+        environment.epoch += 1
+        self.invalidations += 1
+        metrics.command_cache_invalidations.inc()
+
+    def is_cacheable(self, command: str) -> bool:
+        if not command or SHELL_OPERATORS.search(command):
+            return False
+
+        for segment in command.split("|"):
+            segment = " ".join(segment.split())
+            if not any(segment == prefix or segment.startswith(prefix + " ") for prefix in self.allowlist):
+                return False
+
+        return True
+
+    def fingerprint(self, command: str) -> Optional[Tuple]:
+        try:
+            tokens = shlex.split(command)
+        except ValueError:
+            return None
+
+        probes: List[Tuple] = []
+        for token in tokens:
+            host_path = self._host_path(token)
+            if host_path:
+                probes.append((token, self._probe(host_path)))
+
+        return tuple(probes) if probes else None
+
+    def _host_path(self, token: str) -> Optional[str]:
+        token = token.rstrip("/")
+        if token != self.container_root and not token.startswith(self.container_root + "/"):
+            return None
+
+        relative = token[len(self.container_root):].lstrip("/")
+        host_path = os.path.normpath(os.path.join(self.host_root, relative))
+        if host_path != self.host_root and not host_path.startswith(self.host_root + os.sep):
+            return None
+        return host_path
+
+    @staticmethod
+    def _probe(host_path: str) -> Optional[Tuple]:
+        try:
+            status = os.stat(host_path)
+        except OSError:
+            return None
+
+        signature: Tuple = (status.st_mtime_ns, status.st_size)
+        if os.path.isdir(host_path):
+            try:
+                with os.scandir(host_path) as entries:
+                    children = []
+                    for index, entry in enumerate(entries):
+                        if index >= MAX_PROBED_ENTRIES:
+                            logger.debug(f"Directory too large to fingerprint: {host_path}")
+                            return ("unprobed", time.monotonic())
+                        child = entry.stat(follow_symlinks=False)
+                        children.append((entry.name, child.st_mtime_ns, child.st_size))
+            except OSError:
+                return None
+            signature += (tuple(sorted(children)),)
+
+        return signature
+
+
+command_cache = CommandCache()
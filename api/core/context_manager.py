@@ -0,0 +1,145 @@
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.config.settings import settings
+from api.utils.logger import logger
+
+
+EXIT_STATUS_PATTERN = re.compile(r"EXIT: -?\d+")
+
+
+class ContextManager:
+    def __init__(self):
+        self.max_tokens = settings.context_max_tokens
+        self.tool_output_max_chars = settings.context_tool_output_max_chars
+        self.keep_recent_steps = max(settings.context_keep_recent_steps, 1)
+        self.chars_per_token = 4
+        self.message_overhead_tokens = 4
+
+        self.last_prompt_tokens = 0
+        self.tokens_saved = 0
+
+    def estimate_tokens(self, message: Dict[str, Any]) -> int:
+        characters = len(message.get("content") or "")
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function", {})
+            characters += len(function.get("name", "")) + len(function.get("arguments", ""))
+        return characters // self.chars_per_token + self.message_overhead_tokens
+
+    def count_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        return sum(self.estimate_tokens(message) for message in messages)
+
+    def prepare(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        original_tokens = self.count_tokens(messages)
+
+        commands, step_of_call, total_steps = self._index_tool_calls(messages)
+        stale_before_step = (total_steps - self.keep_recent_steps) // self.keep_recent_steps * self.keep_recent_steps
+
+        prepared: List[Dict[str, Any]] = []
+        for message in messages:
+            if message.get("role") == "tool":
+                step = step_of_call.get(message.get("tool_call_id"), total_steps)
+                command = commands.get(message.get("tool_call_id"), "")
+                if step <= stale_before_step:
+                    message = {**message, "content": self._elide(message.get("content") or "", command)}
+                elif len(message.get("content") or "") > self.tool_output_max_chars:
+                    message = {**message, "content": self._truncate(message["content"])}
+            prepared.append(message)
+
+        if self.count_tokens(prepared) > self.max_tokens:
+            prepared = self._summarize_old_steps(prepared, commands, step_of_call, stale_before_step)
+
+        prompt_tokens = self.count_tokens(prepared)
+        saved = original_tokens - prompt_tokens
+        self.last_prompt_tokens = prompt_tokens
+        self.tokens_saved += saved
+
+        if saved > 0:
+            logger.info(f"Context compacted from ~{original_tokens} to ~{prompt_tokens} tokens (saved ~{saved})")
+        if prompt_tokens > self.max_tokens:
+            logger.warning(f"Context still exceeds budget after compaction: ~{prompt_tokens}/{self.max_tokens} tokens")
+
+        return prepared
+
+    @staticmethod
+    def _index_tool_calls(messages: List[Dict[str, Any]]) -> Tuple[Dict[str, str], Dict[str, int], int]:
+        commands: Dict[str, str] = {}
+        step_of_call: Dict[str, int] = {}
+        step = 0
+
+        for message in messages:
+            if message.get("role") != "assistant" or not message.get("tool_calls"):
+                continue
+
+            step += 1
+            for tool_call in message["tool_calls"]:
+                function = tool_call.get("function", {})
+                arguments = function.get("arguments", "")
+                try:
+                    parsed = json.loads(arguments)
+                    command = parsed.get("command") or f"{function.get('name', '')} {parsed.get('path', '')}".strip()
+                except (json.JSONDecodeError, AttributeError):
+                    command = arguments
+                commands[tool_call.get("id")] = command
+                step_of_call[tool_call.get("id")] = step
+
+        return commands, step_of_call, step
+
+    @staticmethod
+    def _status_line(content: str) -> str:
+        match = EXIT_STATUS_PATTERN.search(content[:300])
+        return match.group(0) if match else "EXIT: ?"
+
+    def _elide(self, content: str, command: str) -> str:
+        if content.startswith("[Elided"):
+            return content
+        return (
+            f"[Elided stale output of `{command[:200]}`: {self._status_line(content)}, {len(content)} chars. "
+            f"Re-run the command if you need it again]"
+        )
+
+    def _truncate(self, content: str) -> str:
+        keep = self.tool_output_max_chars // 2
+        omitted = len(content) - 2 * keep
+        return f"{content[:keep]}\n[... {omitted} chars truncated ...]\n{content[-keep:]}"
+
+    def _summarize_old_steps(
+        self,
+        messages: List[Dict[str, Any]],
+        commands: Dict[str, str],
+        step_of_call: Dict[str, int],
+        stale_before_step: int
+    ) -> List[Dict[str, Any]]:
+        summary_lines: List[str] = []
+        statuses: Dict[str, str] = {}
+        summary_position: Optional[int] = None
+
+        for message in messages:
+            if message.get("role") == "tool":
+                statuses[message.get("tool_call_id")] = self._status_line(message.get("content") or "")
+
+        kept: List[Dict[str, Any]] = []
+        for message in messages:
+            role = message.get("role")
+            if role == "assistant" and message.get("tool_calls"):
+                step = step_of_call.get(message["tool_calls"][0].get("id"), stale_before_step + 1)
+                if step <= stale_before_step:
+                    if summary_position is None:
+                        summary_position = len(kept)
+                    for tool_call in message["tool_calls"]:
+                        call_id = tool_call.get("id")
+                        summary_lines.append(f"- step {step}: `{commands.get(call_id, '')[:200]}` -> {statuses.get(call_id, 'EXIT: ?')}")
+                    continue
+            if role == "tool" and step_of_call.get(message.get("tool_call_id"), stale_before_step + 1) <= stale_before_step:
+                continue
+            kept.append(message)
+
+        if summary_position is None:
+            return messages
+
+        kept.insert(summary_position, {
+            "role": "system",
+            "content": "Summary of earlier steps (outputs removed to save context):\n" + "\n".join(summary_lines)
+        })
+        return kept
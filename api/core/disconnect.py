@@ -0,0 +1,83 @@
+import asyncio
+from typing import Optional, Callable, Awaitable, List, TypeVar
+
+from api.config.settings import settings
+from api.utils.logger import logger
+
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class DisconnectMonitor:
+    def __init__(self, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None, poll_interval: Optional[float] = None):
+        self.is_disconnected = is_disconnected
+        self.poll_interval = poll_interval or settings.disconnect_poll_interval
+
+        self.disconnected = False
+        self.stage = "start"
+        self.step = 0
+
+        self._callbacks: List[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        if self.is_disconnected:
+            self._task = asyncio.create_task(self._poll())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def on_disconnect(self, callback: Callable[[], None]) -> Callable[[], None]:
+        self._callbacks.append(callback)
+
+        def unregister() -> None:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+        return unregister
+
+    async def guard(self, awaitable: Awaitable[T]) -> T:
+        if self._task is None:
+            return await awaitable
+
+        task = asyncio.ensure_future(awaitable)
+        if self.disconnected:
+            task.cancel()
+        unregister = self.on_disconnect(task.cancel)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if self.disconnected and not asyncio.current_task().cancelling():
+                raise ClientDisconnected()
+            raise
+        finally:
+            unregister()
+
+    def trigger(self) -> None:
+        if self.disconnected:
+            return
+
+        self.disconnected = True
+        logger.warning(f"Client disconnected during {self.stage} (step {self.step}), cancelling agent run")
+
+        for callback in list(self._callbacks):
+            try:
+                callback()
+            except Exception as error:
+                logger.error(f"Disconnect callback failed: {error}")
+
+    async def _poll(self) -> None:
+        try:
+            while not self.disconnected:
+                await asyncio.sleep(self.poll_interval)
+                if await self.is_disconnected():
+                    self.trigger()
+        except Exception as error:
+            logger.debug(f"Disconnect polling stopped: {error}")
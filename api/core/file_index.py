@@ -0,0 +1,257 @@
+import os
+import stat
+import time
+import asyncio
+import hashlib
+import fnmatch
+import posixpath
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from api.config.settings import settings
+from api.core.metrics import metrics
+from api.utils.logger import logger
+
+
+RACY_WINDOW_NS = 2_000_000_000
+SORT_KEYS = ("path", "mtime", "size")
+
+
+class IndexedFile(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+
+
+class IndexedDirectory(NamedTuple):
+    mtime_ns: int
+    files: Dict[str, IndexedFile]
+    subdirectories: Tuple[str, ...]
+
+
+class FileIndex:
+    def __init__(self):
+        self.enabled = settings.file_index_enabled
+        self.root = os.path.abspath(settings.host_shared_data_path)
+        self.refresh_interval = settings.file_index_refresh_interval
+        self.full_rescan_interval = settings.file_index_full_rescan_interval
+
+        self._directories: Dict[str, IndexedDirectory] = {}
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+        self._sorted: Optional[List[IndexedFile]] = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        self.file_count = 0
+        self.total_bytes = 0
+        self.indexed_at: Optional[float] = None
+        self.last_full_scan = 0.0
+        self.last_refresh_ms = 0.0
+        self.last_rescanned = 0
+        self.refreshes = 0
+        self.full_scans = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "root": self.root,
+            "files": self.file_count,
+            "directories": len(self._directories),
+            "bytes": self.total_bytes,
+            "hashes_cached": len(self._hashes),
+            "indexed_at": int(self.indexed_at) if self.indexed_at else None,
+            "last_refresh_ms": self.last_refresh_ms,
+            "last_rescanned_directories": self.last_rescanned,
+            "refreshes": self.refreshes,
+            "full_scans": self.full_scans
+        }
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+
+        os.makedirs(self.root, exist_ok=True)
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def refresh(self, full: bool = False) -> None:
+        async with self._refresh_lock:
+            full = full or self.indexed_at is None or time.monotonic() - self.last_full_scan >= self.full_rescan_interval
+            started_at = time.perf_counter()
+
+            directories, rescanned = await asyncio.to_thread(self._scan, self._directories, full)
+
+            if rescanned or len(directories) != len(self._directories):
+                self._apply(directories)
+
+            self.indexed_at = time.time()
+            self.last_refresh_ms = round((time.perf_counter() - started_at) * 1000, 2)
+            self.last_rescanned = rescanned
+            self.refreshes += 1
+            if full:
+                self.full_scans += 1
+                self.last_full_scan = time.monotonic()
+
+            metrics.file_index_refreshes.labels("full" if full else "incremental").inc()
+            metrics.file_index_refresh_duration.observe(self.last_refresh_ms / 1000)
+
+    async def ensure_ready(self) -> None:
+        if self.indexed_at is None:
+            await self.refresh()
+
+    def list(
+        self,
+        prefix: str = "",
+        pattern: Optional[str] = None,
+        modified_after: Optional[float] = None,
+        modified_before: Optional[float] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        sort: str = "path"
+    ) -> List[IndexedFile]:
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+
+        prefix = prefix.strip("/")
+        after_ns = int(modified_after * 1e9) if modified_after is not None else None
+        before_ns = int(modified_before * 1e9) if modified_before is not None else None
+        match_path = pattern is not None and "/" in pattern
+
+        matches = []
+        for entry in self._entries():
+            if prefix and not entry.path.startswith(prefix + "/"):
+                continue
+            if after_ns is not None and entry.mtime_ns <= after_ns:
+                continue
+            if before_ns is not None and entry.mtime_ns >= before_ns:
+                continue
+            if min_size is not None and entry.size < min_size:
+                continue
+            if max_size is not None and entry.size > max_size:
+                continue
+            if pattern is not None and not fnmatch.fnmatchcase(entry.path if match_path else posixpath.basename(entry.path), pattern):
+                continue
+            matches.append(entry)
+
+        if sort == "mtime":
+            matches.sort(key=lambda entry: entry.mtime_ns, reverse=True)
+        elif sort == "size":
+            matches.sort(key=lambda entry: entry.size, reverse=True)
+        return matches
+
+    def get(self, path: str) -> Optional[IndexedFile]:
+        directory = self._directories.get(posixpath.dirname(path))
+        return directory.files.get(posixpath.basename(path)) if directory else None
+
+    async def digests(self, entries: List[IndexedFile]) -> Dict[str, Optional[str]]:
+        missing = [entry for entry in entries if self._cached_digest(entry) is None]
+        if missing:
+            computed = await asyncio.to_thread(self._hash_files, missing)
+            self._hashes.update(computed)
+        return {entry.path: self._cached_digest(entry) for entry in entries}
+
+    def _cached_digest(self, entry: IndexedFile) -> Optional[str]:
+        cached = self._hashes.get(entry.path)
+        if cached and cached[0] == entry.size and cached[1] == entry.mtime_ns:
+            return cached[2]
+        return None
+
+    def _hash_files(self, entries: List[IndexedFile]) -> Dict[str, Tuple[int, int, str]]:
+        computed = {}
+        for entry in entries:
+            path = os.path.join(self.root, entry.path)
+            try:
+                with open(path, "rb") as file:
+                    info = os.fstat(file.fileno())
+                    digest = hashlib.file_digest(file, "sha256").hexdigest()
+            except OSError as error:
+                logger.debug(f"Could not hash {path}: {error}")
+                continue
+            if info.st_size == entry.size and info.st_mtime_ns == entry.mtime_ns:
+                computed[entry.path] = (entry.size, entry.mtime_ns, digest)
+        return computed
+
+    def _entries(self) -> List[IndexedFile]:
+        if self._sorted is None:
+            self._sorted = sorted(
+                (entry for directory in self._directories.values() for entry in directory.files.values()),
+                key=lambda entry: entry.path
+            )
+        return self._sorted
+
+    def _apply(self, directories: Dict[str, IndexedDirectory]) -> None:
+        self._directories = directories
+        self._sorted = None
+
+        self.file_count = sum(len(directory.files) for directory in directories.values())
+        self.total_bytes = sum(entry.size for directory in directories.values() for entry in directory.files.values())
+
+        self._hashes = {path: cached for path, cached in self._hashes.items() if self.get(path)}
+
+    def _scan(self, previous: Dict[str, IndexedDirectory], full: bool) -> Tuple[Dict[str, IndexedDirectory], int]:
+        directories: Dict[str, IndexedDirectory] = {}
+        rescanned = 0
+        pending = [""]
+
+        while pending:
+            relative = pending.pop()
+            path = os.path.join(self.root, relative)
+
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+
+            known = previous.get(relative)
+            if known and not full and known.mtime_ns == mtime_ns:
+                directories[relative] = known
+                pending.extend(known.subdirectories)
+                continue
+
+            files: Dict[str, IndexedFile] = {}
+            subdirectories: List[str] = []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        child = posixpath.join(relative, entry.name) if relative else entry.name
+                        try:
+                            info = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if stat.S_ISDIR(info.st_mode):
+                            subdirectories.append(child)
+                        elif stat.S_ISREG(info.st_mode):
+                            files[entry.name] = IndexedFile(child, info.st_size, info.st_mtime_ns)
+            except OSError as error:
+                logger.debug(f"Could not index {path}: {error}")
+                continue
+
+            if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+                mtime_ns = -1
+
+            directories[relative] = IndexedDirectory(mtime_ns, files, tuple(subdirectories))
+            pending.extend(subdirectories)
+            rescanned += 1
+
+        return directories, rescanned
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"Shared data index refresh failed: {error}")
+            await asyncio.sleep(self.refresh_interval)
+
+
+file_index = FileIndex()
@@ -1,27 +1,35 @@
 import json
 import uuid
 import time
-from typing import List, AsyncGenerator, Any, Dict
+import asyncio
+import asyncssh
+from datetime import datetime, timezone
+from contextlib import nullcontext, aclosing
+from typing import List, AsyncGenerator, Any, Dict, Optional, Callable, Awaitable, Union
 
-from openai import AsyncOpenAI
 from openai.types.chat import ChatCompletionToolParam
 
+from api.api.v1.responses import ChunkSerializer, CompletionAggregator
 from api.config.settings import settings
-from api.core.ssh_executor import AsyncSSHExecutor
+from api.core.audit import audit_log
+from api.core.coalescer import DeltaCoalescer
+from api.core.command_cache import command_cache
+from api.core.context_manager import ContextManager
+from api.core.disconnect import ClientDisconnected, DisconnectMonitor
+from api.core.metrics import metrics
+from api.core.prompt_cache import prompt_cache
+from api.core.sandbox_pool import sandbox_pool
+from api.core.session_store import Session, session_store
+from api.core.ssh_executor import AsyncSSHExecutor, CommandResult
+from api.core.tool_dispatcher import ToolCallDispatcher
+from api.core.upstream import upstream
 from api.core.prompts import get_system_prompt
-from api.utils.types import (
-    ChatCompletionRequest,
-    ChatCompletionChunk,
-    ChatCompletionChunkChoice,
-    ChatCompletionChunkDelta,
-    Role
-)
+from api.utils.types import ChatCompletionRequest, ChatCompletion
 from api.utils.logger import logger
 
 
 class LLMGateway:
     def __init__(self):
-        self.client = AsyncOpenAI(base_url="https://openrouter.ai/api/v1", api_key=settings.openrouter_api_key)
         self.default_model = settings.openrouter_model
 
         self.tools: List[ChatCompletionToolParam] = [
@@ -45,25 +53,150 @@ class LLMGateway:
                         "required": ["command"]
                     }
                 }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "write_file",
+                    "description": "Create or overwrite a file on the remote server over SFTP. Parent directories are created. Prefer this over heredocs for any file content.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "path": {
+                                "type": "string",
+                                "description": "Absolute path, or relative to /root (e.g., '/root/data/script.py')"
+                            },
+                            "content": {
+                                "type": "string",
+                                "description": "Full text content of the file"
+                            },
+                            "append": {
+                                "type": "boolean",
+                                "description": "Append to the file instead of replacing it"
+                            }
+                        },
+                        "required": ["path", "content"]
+                    }
+                }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "read_file",
+                    "description": f"Read a text file from the remote server over SFTP, at most {settings.sftp_read_max_bytes} bytes per call. Use offset and length to page through large files.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "path": {
+                                "type": "string",
+                                "description": "Absolute path, or relative to /root"
+                            },
+                            "offset": {
+                                "type": "integer",
+                                "description": "Byte offset to start reading from (default 0)"
+                            },
+                            "length": {
+                                "type": "integer",
+                                "description": "Number of bytes to read"
+                            }
+                        },
+                        "required": ["path"]
+                    }
+                }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "list_dir",
+                    "description": "List a directory on the remote server with entry type, size and modification time.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "path": {
+                                "type": "string",
+                                "description": "Directory path (default /root)"
+                            }
+                        }
+                    }
+                }
             }
         ]
 
-    async def process_request(self, request: ChatCompletionRequest) -> AsyncGenerator[str, None]:
-        request_id = f"chatcmpl-{uuid.uuid4()}"
-        created_timestamp = int(time.time())
-
-        messages = [{"role": "system", "content": get_system_prompt()}]
-        messages.extend(request.messages)
+    async def process_request(
+        self,
+        request: ChatCompletionRequest,
+        session: Optional[Session] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        serializer: Optional[Union[ChunkSerializer, CompletionAggregator]] = None
+    ) -> AsyncGenerator[Optional[str], None]:
+        if serializer is None:
+            serializer = ChunkSerializer(f"chatcmpl-{uuid.uuid4()}", int(time.time()), self.default_model)
+        request_id = serializer.request_id
+
+        async with session.lock if session else nullcontext(), DisconnectMonitor(is_disconnected) as monitor:
+            messages = [{"role": "system", "content": get_system_prompt()}]
+            if session:
+                messages.extend(session.messages)
+            messages.extend(message.model_dump(mode="json", exclude_none=True) for message in request.messages)
+
+            try:
+                async with aclosing(self._run_agent(request, messages, serializer, request_id, session, monitor)) as agent:
+                    async for sse_chunk in agent:
+                        yield sse_chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                self._record_cancellation(request_id, monitor)
+                raise
+
+            if monitor.disconnected:
+                self._record_cancellation(request_id, monitor)
+                return
+
+            if session:
+                await session_store.save(session, messages[1:])
+
+    async def complete(
+        self,
+        request: ChatCompletionRequest,
+        session: Optional[Session] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> ChatCompletion:
+        aggregator = CompletionAggregator(f"chatcmpl-{uuid.uuid4()}", int(time.time()), self.default_model)
+
+        async with aclosing(self.process_request(request, session, is_disconnected, aggregator)) as events:
+            async for _ in events:
+                pass
+
+        return aggregator.build()
+
+    def _record_cancellation(self, request_id: str, monitor: DisconnectMonitor) -> None:
+        logger.warning(f"Request {request_id} cancelled during {monitor.stage} (step {monitor.step})")
+        metrics.cancellations.labels(monitor.stage).inc()
+        audit_log.record("cancelled", request_id=request_id, step=monitor.step, stage=monitor.stage)
+
+    async def _run_agent(
+        self,
+        request: ChatCompletionRequest,
+        messages: List[Dict[str, Any]],
+        serializer: Union[ChunkSerializer, CompletionAggregator],
+        request_id: str,
+        session: Optional[Session],
+        monitor: DisconnectMonitor
+    ) -> AsyncGenerator[Optional[str], None]:
+        context = ContextManager()
+        coalescer = DeltaCoalescer(request.coalesce_ms) if request.coalesce_ms else None
 
         step_count = 0
         max_steps = settings.max_agent_steps
 
-        async with AsyncSSHExecutor() as executor:
+        cache = session.command_cache if session else command_cache.scope()
+
+        async with sandbox_pool.lease(session.id if session else None) as pool, AsyncSSHExecutor(pool, request_id=request_id, cache=cache) as executor:
             while step_count < max_steps:
                 logger.info(f"Processing agent step {step_count + 1}/{max_steps}")
 
+                prompt_messages = context.prepare(messages)
                 if max_steps - step_count <= 3:
-                    messages.append({
+                    prompt_messages.append({
                         "role": "system",
                         "content": f"WARNING: You have {max_steps - step_count} steps remaining. Wrap up your task immediately."
                     })
@@ -71,53 +204,130 @@ class LLMGateway:
                 current_tool_calls: Dict[int, Dict[str, Any]] = {}
                 response_content = ""
 
+                model = request.model or self.default_model
+                monitor.stage, monitor.step = "llm", step_count + 1
+                requested_at = time.perf_counter()
+                first_token_received = False
+
                 try:
-                    stream = await self.client.chat.completions.create(
-                        model=request.model or self.default_model,
-                        messages=messages,
+                    stream = await monitor.guard(upstream.stream(
+                        model=model,
+                        messages=prompt_cache.apply(prompt_messages, model),
                         tools=self.tools,
                         tool_choice="auto",
                         stream=True,
+                        stream_options={"include_usage": True},
                         temperature=request.temperature,
                         top_p=request.top_p,
                         frequency_penalty=request.frequency_penalty,
                         presence_penalty=request.presence_penalty
-                    )
+                    ))
+                except ClientDisconnected:
+                    return
                 except Exception as error:
                     logger.error(f"OpenRouter API failed: {error}")
-                    yield self._create_error_chunk(request_id, created_timestamp, str(error))
+                    metrics.error("llm", error)
+                    metrics.agent_steps.observe(step_count + 1)
+                    yield serializer.error(str(error))
                     return
 
-                async for chunk in stream:
-                    if not chunk.choices:
-                        continue
-
-                    delta = chunk.choices[0].delta
-
-                    if delta.content:
-                        response_content += delta.content
-                        yield self._create_chunk(request_id, created_timestamp, content=delta.content)
-
-                    if delta.tool_calls:
-                        for tool_call in delta.tool_calls:
-                            index = tool_call.index
-                            if index not in current_tool_calls:
-                                current_tool_calls[index] = {
-                                    "id": tool_call.id,
-                                    "function": {"name": "", "arguments": ""}
-                                }
-                            if tool_call.id:
-                                current_tool_calls[index]["id"] = tool_call.id
-                            if tool_call.function.name:
-                                current_tool_calls[index]["function"]["name"] += tool_call.function.name
-                            if tool_call.function.arguments:
-                                current_tool_calls[index]["function"]["arguments"] += tool_call.function.arguments
+                step = step_count + 1
+                dispatcher = ToolCallDispatcher(
+                    lambda tool_call, emit: self._execute_tool_call(executor, tool_call, emit, serializer, step),
+                    monitor
+                )
+                stream_completed = False
+
+                chunks = coalescer.iterate(stream) if coalescer else stream
+                chunk_iterator = chunks.__aiter__()
+                try:
+                    while True:
+                        try:
+                            chunk = await monitor.guard(chunk_iterator.__anext__())
+                        except (StopAsyncIteration, ClientDisconnected):
+                            break
+                        if monitor.disconnected:
+                            break
+
+                        for event in dispatcher.drain():
+                            yield event
+
+                        if chunk is None:
+                            buffered = coalescer.flush()
+                            if buffered:
+                                yield serializer.content(buffered)
+                            continue
+
+                        if getattr(chunk, "usage", None):
+                            prompt_cache.record_usage(chunk.usage)
+                            serializer.add_usage(chunk.usage)
+
+                        if not chunk.choices:
+                            continue
+
+                        if not first_token_received:
+                            first_token_received = True
+                            metrics.llm_time_to_first_token.observe(time.perf_counter() - requested_at)
+
+                        delta = chunk.choices[0].delta
+
+                        if delta.content:
+                            response_content += delta.content
+                            if coalescer:
+                                buffered = coalescer.add(delta.content)
+                                if buffered:
+                                    yield serializer.content(buffered)
+                            else:
+                                yield serializer.content(delta.content)
+
+                        if delta.tool_calls:
+                            if coalescer:
+                                buffered = coalescer.flush()
+                                if buffered:
+                                    yield serializer.content(buffered)
+
+                            for tool_call in delta.tool_calls:
+                                index = tool_call.index
+                                if index not in current_tool_calls:
+                                    current_tool_calls[index] = {
+                                        "id": tool_call.id,
+                                        "function": {"name": "", "arguments": ""}
+                                    }
+                                if tool_call.id:
+                                    current_tool_calls[index]["id"] = tool_call.id
+                                if tool_call.function.name:
+                                    current_tool_calls[index]["function"]["name"] += tool_call.function.name
+                                if tool_call.function.arguments:
+                                    current_tool_calls[index]["function"]["arguments"] += tool_call.function.arguments
+                                dispatcher.observe(index, current_tool_calls, tool_call.function.arguments)
+                    stream_completed = not monitor.disconnected
+                finally:
+                    if coalescer:
+                        await chunks.aclose()
+                    await asyncio.shield(stream.close())
+                    if not stream_completed:
+                        dispatcher.close()
+
+                if monitor.disconnected:
+                    return
+
+                metrics.llm_stream_duration.observe(time.perf_counter() - requested_at)
+
+                if coalescer:
+                    buffered = coalescer.flush()
+                    if buffered:
+                        yield serializer.content(buffered)
 
                 if not current_tool_calls:
-                    logger.info("Agent decided to stop execution")
-                    yield "[DONE]"
+                    logger.info(f"Agent decided to stop execution (context tokens saved: ~{context.tokens_saved})")
+                    metrics.agent_steps.observe(step_count + 1)
+                    if response_content:
+                        messages.append({"role": "assistant", "content": response_content})
+                    yield serializer.done()
                     return
 
+                metrics.tool_calls_per_step.observe(len(current_tool_calls))
+
                 messages.append({
                     "role": "assistant",
                     "content": response_content if response_content else None,
@@ -130,82 +340,173 @@ class LLMGateway:
                     ]
                 })
 
-                for tc in current_tool_calls.values():
-                    function_name = tc["function"]["name"]
-                    arguments_str = tc["function"]["arguments"]
-                    tool_call_id = tc["id"]
+                monitor.stage = "tools"
+                dispatcher.finish(current_tool_calls)
+                async with aclosing(dispatcher.events()) as tool_events:
+                    async for sse_chunk in tool_events:
+                        yield sse_chunk
 
-                    if function_name == "execute_ssh_command":
-                        try:
-                            args = json.loads(arguments_str)
-                            command = args.get("command")
-                            input_data = args.get("input_data")
-
-                            yield self._create_chunk(
-                                request_id,
-                                created_timestamp,
-                                command_output=f"> {command}"
-                            )
-
-                            exit_code, stdout, stderr = await executor.execute_command(command, input_data)
-
-                            yield self._create_chunk(request_id, created_timestamp, command_output="< " + (stdout or stderr))
-
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call_id,
-                                "name": function_name,
-                                "content": f"EXIT: {exit_code}\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}"
-                            })
-                        except json.JSONDecodeError:
-                            err_msg = "Error: Model generated invalid JSON arguments"
-                            logger.warning(err_msg)
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call_id,
-                                "name": function_name,
-                                "content": err_msg
-                            })
-                        except Exception as error:
-                            err_msg = f"Internal Execution Error: {str(error)}"
-                            logger.error(err_msg)
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call_id,
-                                "name": function_name,
-                                "content": err_msg
-                            })
+                if monitor.disconnected:
+                    return
+
+                messages.extend(dispatcher.messages(current_tool_calls))
 
                 step_count += 1
 
+            metrics.agent_steps.observe(step_count)
+
             limit_msg = "\n[System: Execution limit reached. Halting process]"
-            yield self._create_chunk(request_id, created_timestamp, content=limit_msg)
-            yield "[DONE]"
-
-    def _create_chunk(self, req_id: str, created: int, content: str = None, command_output: str = None) -> str:
-        from api.api.v1.responses import create_sse_event
-
-        delta = ChatCompletionChunkDelta(
-            role=Role.ASSISTANT if content else None,
-            content=content,
-            command_output=command_output
-        )
-
-        chunk = ChatCompletionChunk(
-            id=req_id, created=created, model=self.default_model,
-            choices=[ChatCompletionChunkChoice(index=0, delta=delta)]
-        )
-        return create_sse_event(chunk)
-
-    def _create_error_chunk(self, req_id: str, created: int, error_msg: str) -> str:
-        from api.api.v1.responses import create_sse_event
-
-        delta = ChatCompletionChunkDelta(content=f"\n**System Error**: {error_msg}")
-        chunk = ChatCompletionChunk(
-            id=req_id, created=created, model=self.default_model,
-            choices=[ChatCompletionChunkChoice(index=0, delta=delta, finish_reason="stop")]
-        )
-        return create_sse_event(chunk)
+            yield serializer.content(limit_msg)
+            yield serializer.done()
+
+    async def _execute_tool_call(
+        self,
+        executor: AsyncSSHExecutor,
+        tool_call: Dict[str, Any],
+        emit: Callable[[Optional[str]], None],
+        serializer: Union[ChunkSerializer, CompletionAggregator],
+        step: int
+    ) -> Dict[str, Any]:
+        function_name = tool_call["function"]["name"]
+        arguments_str = tool_call["function"]["arguments"]
+        tool_call_id = tool_call["id"]
+
+        handlers = {
+            "execute_ssh_command": self._run_command,
+            "write_file": self._write_file,
+            "read_file": self._read_file,
+            "list_dir": self._list_dir
+        }
+        handler = handlers.get(function_name)
+
+        if handler is None:
+            err_msg = f"Error: Unknown tool '{function_name}'"
+            logger.warning(err_msg)
+            return {"role": "tool", "tool_call_id": tool_call_id, "name": function_name, "content": err_msg}
+
+        try:
+            args = json.loads(arguments_str)
+            content = await handler(executor, args, tool_call_id, emit, serializer, step)
+
+            return {
+                "role": "tool",
+                "tool_call_id": tool_call_id,
+                "name": function_name,
+                "content": content
+            }
+        except json.JSONDecodeError:
+            err_msg = "Error: Model generated invalid JSON arguments"
+            logger.warning(err_msg)
+        except (asyncssh.SFTPError, ValueError) as error:
+            err_msg = f"EXIT: 1\nError: {error}"
+            logger.warning(f"{function_name} failed: {error}")
+            emit(serializer.command_result(CommandResult(1, "", str(error)), tool_call_id))
+        except Exception as error:
+            err_msg = f"Internal Execution Error: {str(error)}"
+            logger.error(err_msg)
+
+        return {
+            "role": "tool",
+            "tool_call_id": tool_call_id,
+            "name": function_name,
+            "content": err_msg
+        }
+
+    @staticmethod
+    async def _run_command(
+        executor: AsyncSSHExecutor,
+        args: Dict[str, Any],
+        tool_call_id: str,
+        emit: Callable[[Optional[str]], None],
+        serializer: Union[ChunkSerializer, CompletionAggregator],
+        step: int
+    ) -> str:
+        command = args.get("command")
+        input_data = args.get("input_data")
+
+        emit(serializer.command_started(command, tool_call_id))
+
+        result = None
+        async for event in executor.stream_command(command, input_data, step):
+            if isinstance(event, CommandResult):
+                result = event
+            else:
+                emit(serializer.command_chunk(event.data, tool_call_id))
+
+        exit_code, stdout, stderr = result
+
+        emit(serializer.command_result(result, tool_call_id))
+
+        return f"EXIT: {exit_code}\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}"
+
+    @staticmethod
+    async def _write_file(
+        executor: AsyncSSHExecutor,
+        args: Dict[str, Any],
+        tool_call_id: str,
+        emit: Callable[[Optional[str]], None],
+        serializer: Union[ChunkSerializer, CompletionAggregator],
+        step: int
+    ) -> str:
+        path = args.get("path")
+        if not path:
+            raise ValueError("'path' is required")
+        append = bool(args.get("append"))
+
+        emit(serializer.command_started(f"write_file {path}", tool_call_id))
+        written = await executor.write_file(path, (args.get("content") or "").encode("utf-8"), append, step)
+
+        summary = f"{'Appended' if append else 'Wrote'} {written} bytes to {path}"
+        emit(serializer.command_result(CommandResult(0, summary, ""), tool_call_id))
+        return f"EXIT: 0\n{summary}"
+
+    @staticmethod
+    async def _read_file(
+        executor: AsyncSSHExecutor,
+        args: Dict[str, Any],
+        tool_call_id: str,
+        emit: Callable[[Optional[str]], None],
+        serializer: Union[ChunkSerializer, CompletionAggregator],
+        step: int
+    ) -> str:
+        path = args.get("path")
+        if not path:
+            raise ValueError("'path' is required")
+        offset = max(int(args.get("offset") or 0), 0)
+        length = min(max(int(args.get("length") or settings.sftp_read_max_bytes), 1), settings.sftp_read_max_bytes)
+
+        emit(serializer.command_started(f"read_file {path}", tool_call_id))
+        size = await executor.file_size(path)
+        data = await executor.read_file(path, offset, length, step)
+        end = offset + len(data)
+
+        summary = f"Read bytes {offset}-{end} of {size} from {path}"
+        emit(serializer.command_result(CommandResult(0, summary, ""), tool_call_id))
+
+        remainder = f"\n[{size - end} more bytes, continue with offset={end}]" if end < size else ""
+        return f"EXIT: 0\nBYTES: {offset}-{end} of {size}\n{data.decode('utf-8', errors='replace')}{remainder}"
+
+    @staticmethod
+    async def _list_dir(
+        executor: AsyncSSHExecutor,
+        args: Dict[str, Any],
+        tool_call_id: str,
+        emit: Callable[[Optional[str]], None],
+        serializer: Union[ChunkSerializer, CompletionAggregator],
+        step: int
+    ) -> str:
+        path = args.get("path") or "."
+
+        emit(serializer.command_started(f"list_dir {path}", tool_call_id))
+        entries = await executor.list_dir(path, step)
+
+        lines = [
+            f"{entry.type:<4} {entry.size:>12} {datetime.fromtimestamp(entry.mtime, timezone.utc):%Y-%m-%d %H:%M} {entry.name}"
+            for entry in entries
+        ]
+        summary = f"{len(entries)} entries in {path}"
+        emit(serializer.command_result(CommandResult(0, summary, ""), tool_call_id))
+        return f"EXIT: 0\n{summary}\n" + "\n".join(lines)
 
 
 llm_gateway = LLMGateway()
@@ -0,0 +1,217 @@
+from bisect import bisect_left
+from contextlib import aclosing, contextmanager
+from typing import Dict, List, Tuple, Optional, Sequence, AsyncIterator, Iterator
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (0, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 8, 10, 15, 20, 25, 50)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, *values: str):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._new_child()
+            self._children[key] = child
+        return child
+
+    def _new_child(self) -> "_Metric":
+        raise NotImplementedError
+
+    def _samples(self) -> List[Tuple[str, Optional[Tuple[str, str]], float]]:
+        raise NotImplementedError
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], "_Metric"]]:
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, series in self._series():
+            for suffix, extra, value in series._samples():
+                lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, label_values, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def _samples(self):
+        return [("", None, self.value)]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _new_child(self) -> "Gauge":
+        return Gauge(self.name, self.documentation)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def _samples(self):
+        return [("", None, self.value)]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def _samples(self):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            samples.append(("_bucket", ("le", _format_value(bound)), cumulative))
+        samples.append(("_sum", None, self.sum))
+        samples.append(("_count", None, self.count))
+        return samples
+
+
+class Metrics:
+    def __init__(self, namespace: str = "interactive_ai"):
+        self._registry: List[_Metric] = []
+
+        def register(metric: _Metric) -> _Metric:
+            self._registry.append(metric)
+            return metric
+
+        prefix = f"{namespace}_"
+
+        self.requests_in_flight = register(Gauge(prefix + "requests_in_flight", "Chat completion requests currently being served"))
+        self.requests_total = register(Counter(prefix + "requests_total", "Chat completion requests started"))
+        self.sse_chunks_sent = register(Counter(prefix + "sse_chunks_sent_total", "SSE events written to clients"))
+        self.sse_bytes_sent = register(Counter(prefix + "sse_bytes_sent_total", "SSE bytes written to clients"))
+
+        self.admission_queue_depth = register(Gauge(prefix + "admission_queue_depth", "Requests waiting for an agent slot"))
+        self.admission_wait = register(Histogram(prefix + "admission_wait_seconds", "Time admitted requests spent waiting for an agent slot"))
+        self.admission_rejected = register(Counter(prefix + "admission_rejected_total", "Requests rejected by admission control", ("reason",)))
+
+        self.llm_time_to_first_token = register(Histogram(prefix + "llm_time_to_first_token_seconds", "Time from LLM request to the first streamed delta, per agent step"))
+        self.llm_stream_duration = register(Histogram(prefix + "llm_stream_duration_seconds", "Total LLM stream time per agent step"))
+        self.upstream_retries = register(Counter(prefix + "upstream_retries_total", "LLM requests retried before the first token, by reason", ("reason",)))
+        self.upstream_hedges = register(Counter(prefix + "upstream_hedges_total", "Hedged LLM requests fired and won", ("outcome",)))
+        self.agent_steps = register(Histogram(prefix + "agent_steps_per_request", "LLM calls made per chat completion request", COUNT_BUCKETS))
+        self.tool_calls_per_step = register(Histogram(prefix + "tool_calls_per_step", "Tool calls requested by the model in one agent step", COUNT_BUCKETS))
+
+        self.tool_calls_dispatched_early = register(Counter(prefix + "tool_calls_dispatched_early_total", "Tool calls started while the model was still streaming"))
+
+        self.ssh_connect_duration = register(Histogram(prefix + "ssh_connect_duration_seconds", "Time to establish a new SSH connection"))
+        self.command_duration = register(Histogram(prefix + "command_duration_seconds", "Remote command execution time"))
+        self.persistent_shells_started = register(Counter(prefix + "persistent_shells_started_total", "Persistent shells started, new or restarted after exiting", ("reason",)))
+        self.sftp_bytes = register(Counter(prefix + "sftp_bytes_total", "Bytes moved over SFTP by direction", ("direction",)))
+        self.command_output_bytes = register(Histogram(prefix + "command_output_bytes", "Stdout plus stderr bytes produced by a remote command", BYTES_BUCKETS))
+        self.command_output_spills = register(Counter(prefix + "command_output_spills_total", "Command output streams that exceeded the capture limits and were spilled to a file"))
+
+        self.file_index_refreshes = register(Counter(prefix + "file_index_refreshes_total", "Shared data index refreshes by mode", ("mode",)))
+        self.file_index_refresh_duration = register(Histogram(prefix + "file_index_refresh_duration_seconds", "Time to refresh the shared data index"))
+
+        self.command_cache_hits = register(Counter(prefix + "command_cache_hits_total", "Read-only command results served from the session cache"))
+        self.command_cache_misses = register(Counter(prefix + "command_cache_misses_total", "Cacheable commands that had to be executed"))
+        self.command_cache_invalidations = register(Counter(prefix + "command_cache_invalidations_total", "Cache invalidations caused by potentially mutating commands"))
+        self.batch_tasks = register(Counter(prefix + "batch_tasks_total", "Batch tasks finished, by outcome", ("status",)))
+        self.cancellations = register(Counter(prefix + "cancellations_total", "Agent runs abandoned by the client, by the stage they were in", ("stage",)))
+        self.commands_cancelled = register(Counter(prefix + "commands_cancelled_total", "Remote commands terminated before completion because their run was cancelled"))
+        self.errors = register(Counter(prefix + "errors_total", "Errors and timeouts by stage and class", ("stage", "error")))
+
+    def error(self, stage: str, error) -> None:
+        name = error if isinstance(error, str) else type(error).__name__
+        self.errors.labels(stage, name).inc()
+
+    @contextmanager
+    def track_request(self) -> Iterator[None]:
+        self.requests_total.inc()
+        self.requests_in_flight.inc()
+        try:
+            yield
+        finally:
+            self.requests_in_flight.dec()
+
+    async def track_stream(self, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+        with self.track_request():
+            try:
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        self.sse_chunks_sent.inc()
+                        self.sse_bytes_sent.inc(len(chunk.encode("utf-8")))
+                        yield chunk
+            except Exception as error:
+                self.error("stream", error)
+                raise
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._registry:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,173 @@
+import os
+import time
+import uuid
+import asyncio
+import posixpath
+from collections import deque
+from typing import Deque, List, Optional, TextIO
+
+from api.config.settings import settings
+from api.core.metrics import metrics
+from api.utils.logger import logger
+
+
+PRUNE_INTERVAL = 300.0
+SPILL_FLUSH_CHARS = 256 * 1024
+
+_last_prune = 0.0
+
+
+def prune_spill_files() -> None:
+    global _last_prune
+
+    now = time.time()
+    if now - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = now
+
+    directory = os.path.join(settings.host_shared_data_path, settings.command_output_spill_dir)
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and now - entry.stat().st_mtime > settings.command_output_spill_max_age:
+                    os.remove(entry.path)
+    except OSError as error:
+        logger.debug(f"Could not prune spill files: {error}")
+
+
+class OutputCapture:
+    def __init__(self, stream: str, label: str):
+        self.stream = stream
+        self.label = label
+        self.head_limit = max(settings.command_output_head_chars, 0)
+        self.tail_limit = max(settings.command_output_tail_chars, 1)
+        self.spill_enabled = settings.command_output_spill_enabled
+
+        self._head: List[str] = []
+        self._head_size = 0
+        self._tail: Deque[str] = deque()
+        self._tail_size = 0
+
+        self.total_chars = 0
+        self.total_bytes = 0
+
+        self._file: Optional[TextIO] = None
+        self._spilling = False
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self.spill_path: Optional[str] = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_chars > self._head_size + self._tail_size
+
+    def add(self, data: str) -> None:
+        self.total_chars += len(data)
+        self.total_bytes += len(data.encode("utf-8"))
+
+        if self._spilling:
+            self._queue(data)
+
+        room = self.head_limit - self._head_size
+        if room > 0:
+            self._head.append(data[:room])
+            self._head_size += min(room, len(data))
+            data = data[room:]
+            if not data:
+                return
+
+        if not self._spilling and self._tail_size + len(data) > self.tail_limit and self.spill_enabled:
+            self._start_spill(data)
+
+        self._tail.append(data)
+        self._tail_size += len(data)
+
+        while self._tail_size - len(self._tail[0]) >= self.tail_limit:
+            self._tail_size -= len(self._tail.popleft())
+        if self._tail_size > self.tail_limit:
+            excess = self._tail_size - self.tail_limit
+            self._tail[0] = self._tail[0][excess:]
+            self._tail_size -= excess
+
+    def text(self) -> str:
+        head = "".join(self._head)
+        tail = "".join(self._tail)
+        if not self.truncated:
+            return head + tail
+
+        omitted = self.total_chars - self._head_size - self._tail_size
+        if self.spill_path:
+            location = f"Full output saved to {self.spill_path}; page through it with read_file or sed/tail"
+        else:
+            location = "The omitted part was not kept"
+
+        return (
+            f"[Output truncated: {self.total_bytes} bytes in total, showing the first {self._head_size} "
+            f"and last {self._tail_size} characters. {location}]\n"
+            f"{head}\n[... {omitted} characters omitted ...]\n{tail}"
+        )
+
+    async def flush(self, force: bool = False) -> None:
+        if not self._pending or (not force and self._pending_size < SPILL_FLUSH_CHARS):
+            return
+
+        data = "".join(self._pending)
+        self._pending.clear()
+        self._pending_size = 0
+
+        if self._file is None and not await asyncio.to_thread(self._open):
+            return
+
+        try:
+            await asyncio.to_thread(self._file.write, data)
+        except OSError as error:
+            logger.warning(f"Spill file write failed, discarding overflow: {error}")
+            await self._close_file()
+            self.spill_path = None
+            self._spilling = False
+            self.spill_enabled = False
+
+    async def close(self) -> None:
+        if self._spilling:
+            await self.flush(force=True)
+        self._spilling = False
+        self.spill_enabled = False
+        await self._close_file()
+
+    async def _close_file(self) -> None:
+        if self._file:
+            file, self._file = self._file, None
+            try:
+                await asyncio.to_thread(file.close)
+            except OSError as error:
+                logger.warning(f"Could not finish spill file {self.spill_path}: {error}")
+
+    def _start_spill(self, pending: str) -> None:
+        self._spilling = True
+        self._queue("".join(self._head))
+        self._queue("".join(self._tail))
+        self._queue(pending)
+
+    def _queue(self, data: str) -> None:
+        self._pending.append(data)
+        self._pending_size += len(data)
+
+    def _open(self) -> bool:
+        prune_spill_files()
+
+        name = f"{self.label}-{uuid.uuid4().hex[:8]}-{self.stream}.log"
+        directory = os.path.join(settings.host_shared_data_path, settings.command_output_spill_dir)
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(os.path.join(directory, name), "w", encoding="utf-8")
+        except OSError as error:
+            logger.warning(f"Could not spill command output to {directory}: {error}")
+            self._spilling = False
+            self.spill_enabled = False
+            return False
+
+        self.spill_path = posixpath.join(settings.container_shared_data_path, settings.command_output_spill_dir, name)
+        metrics.command_output_spills.inc()
+        logger.info(f"Command {self.stream} exceeds capture limits, spilling to {self.spill_path}")
+        return True
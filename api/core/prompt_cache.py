@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, Optional
+
+from api.config.settings import settings
+from api.utils.logger import logger
+
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+class PromptCache:
+    def __init__(self):
+        self.mode = settings.prompt_cache_mode.lower()
+        self.model_prefixes = tuple(prefix.strip() for prefix in settings.prompt_cache_model_prefixes.split(",") if prefix.strip())
+
+        self._system_content: Optional[str] = None
+        self._system_blocks: List[Dict[str, Any]] = []
+
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "requests": self.requests,
+            "hits": self.hits,
+            "misses": self.misses,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0
+        }
+
+    def supports_markers(self, model: str) -> bool:
+        if self.mode == "off":
+            return False
+        if self.mode == "on":
+            return True
+        return model.startswith(self.model_prefixes)
+
+    def apply(self, messages: List[Dict[str, Any]], model: str) -> List[Dict[str, Any]]:
+        if not messages or not self.supports_markers(model):
+            return messages
+
+        marked = list(messages)
+
+        if marked[0].get("role") == "system" and isinstance(marked[0].get("content"), str):
+            marked[0] = {**marked[0], "content": self._system_prefix_blocks(marked[0]["content"])}
+
+        for position in range(len(marked) - 1, 0, -1):
+            content = marked[position].get("content")
+            if isinstance(content, str) and content:
+                marked[position] = {
+                    **marked[position],
+                    "content": [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+                }
+                break
+
+        return marked
+
+    def record_usage(self, usage: Any) -> Optional[int]:
+        if usage is None:
+            return None
+
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) if details else 0) or 0
+
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        if cached_tokens:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        logger.debug(f"Prompt cache {'hit' if cached_tokens else 'miss'}: {cached_tokens}/{prompt_tokens} prompt tokens cached")
+        return cached_tokens
+
+    def _system_prefix_blocks(self, content: str) -> List[Dict[str, Any]]:
+        if content is not self._system_content:
+            self._system_content = content
+            self._system_blocks = [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+        return self._system_blocks
+
+
+prompt_cache = PromptCache()
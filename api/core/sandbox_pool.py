@@ -0,0 +1,377 @@
+import os
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+from api.config.settings import settings
+from api.core.ssh_executor import SSHConnectionPool, ssh_pool
+from api.utils.logger import logger
+
+
+class Sandbox:
+    def __init__(self, name: str, port: int):
+        self.name = name
+        self.port = port
+        self.state = "starting"
+        self.ssh_pool: Optional[SSHConnectionPool] = None
+        self.ready = asyncio.Event()
+        self.session_id: Optional[str] = None
+        self.active_leases = 0
+        self.last_used = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "port": self.port,
+            "state": self.state,
+            "session_id": self.session_id,
+            "active_leases": self.active_leases
+        }
+
+
+class SandboxPool:
+    def __init__(self):
+        self.enabled = settings.sandbox_pool_enabled
+        self.image = settings.sandbox_image
+        self.name_prefix = settings.sandbox_name_prefix
+        self.warm_size = settings.sandbox_pool_warm_size
+        self.max_size = max(settings.sandbox_pool_max_size, 1)
+        self.base_port = settings.sandbox_base_port
+        self.idle_timeout = settings.sandbox_idle_timeout
+        self.session_idle_timeout = settings.sandbox_session_idle_timeout
+        self.start_timeout = settings.sandbox_start_timeout
+        self.acquire_timeout = settings.sandbox_acquire_timeout
+        self.maintenance_interval = 5.0
+
+        self._sandboxes: Dict[int, Sandbox] = {}
+        self._idle: Deque[Sandbox] = deque()
+        self._sessions: Dict[str, Sandbox] = {}
+        self._condition = asyncio.Condition()
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._background_tasks: Set[asyncio.Task] = set()
+
+        self.leases = 0
+        self.cold_starts = 0
+        self.provisioned = 0
+        self.recycled = 0
+        self.provision_failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._sandboxes),
+            "idle": len(self._idle),
+            "sessions": len(self._sessions),
+            "warm_size": self.warm_size,
+            "max_size": self.max_size,
+            "leases": self.leases,
+            "cold_starts": self.cold_starts,
+            "provisioned": self.provisioned,
+            "recycled": self.recycled,
+            "provision_failures": self.provision_failures,
+            "sandboxes": [sandbox.stats() for sandbox in self._sandboxes.values()]
+        }
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+
+        await self._remove_stale_containers()
+        await self._replenish()
+
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+        logger.info(f"Sandbox pool started with {len(self._idle)} warm containers")
+
+    async def close(self) -> None:
+        if not self.enabled:
+            return
+
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+
+        for task in list(self._background_tasks):
+            task.cancel()
+
+        sandboxes = list(self._sandboxes.values())
+        self._sandboxes.clear()
+        self._idle.clear()
+        self._sessions.clear()
+
+        await asyncio.gather(*(self._destroy(sandbox) for sandbox in sandboxes), return_exceptions=True)
+        logger.info("Sandbox pool closed")
+
+    @asynccontextmanager
+    async def lease(self, session_id: Optional[str] = None) -> AsyncIterator[SSHConnectionPool]:
+        if not self.enabled:
+            yield ssh_pool
+            return
+
+        sandbox = await self.acquire(session_id)
+        try:
+            yield sandbox.ssh_pool
+        finally:
+            await asyncio.shield(self.release(sandbox))
+
+    async def acquire(self, session_id: Optional[str] = None) -> Sandbox:
+        try:
+            sandbox, needs_provisioning = await asyncio.wait_for(self._reserve(session_id), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"No sandbox became available within {self.acquire_timeout}s")
+
+        self.leases += 1
+
+        if needs_provisioning:
+            self.cold_starts += 1
+            logger.warning(f"No warm sandbox available, cold-starting {sandbox.name}")
+            try:
+                await self._provision(sandbox)
+            except Exception as error:
+                await self._forget(sandbox)
+                raise ConnectionError(f"Could not start sandbox container: {error}")
+            sandbox.state = "leased"
+        else:
+            await sandbox.ready.wait()
+            if sandbox.ssh_pool is None:
+                raise ConnectionError(f"Sandbox {sandbox.name} failed to start")
+
+        self._spawn(self._replenish())
+        return sandbox
+
+    async def release(self, sandbox: Sandbox) -> None:
+        async with self._condition:
+            sandbox.active_leases -= 1
+            sandbox.last_used = asyncio.get_running_loop().time()
+
+            if sandbox.active_leases > 0:
+                return
+            if sandbox.session_id is not None:
+                sandbox.state = "assigned"
+                return
+
+            sandbox.state = "recycling"
+
+        self._spawn(self._recycle(sandbox))
+
+    async def end_session(self, session_id: str) -> None:
+        async with self._condition:
+            sandbox = self._sessions.pop(session_id, None)
+            if sandbox is None:
+                return
+
+            sandbox.session_id = None
+            if sandbox.active_leases > 0:
+                return
+
+            sandbox.state = "recycling"
+
+        logger.info(f"Session {session_id} ended, recycling sandbox {sandbox.name}")
+        self._spawn(self._recycle(sandbox))
+
+    async def _reserve(self, session_id: Optional[str]) -> Tuple[Sandbox, bool]:
+        async with self._condition:
+            while True:
+                if session_id and session_id in self._sessions:
+                    sandbox = self._sessions[session_id]
+                    sandbox.state = "leased"
+                    sandbox.active_leases += 1
+                    return sandbox, False
+
+                needs_provisioning = False
+                if self._idle:
+                    sandbox = self._idle.pop()
+                elif len(self._sandboxes) < self.max_size:
+                    sandbox = self._new_sandbox()
+                    needs_provisioning = True
+                else:
+                    await self._condition.wait()
+                    continue
+
+                sandbox.state = "starting" if needs_provisioning else "leased"
+                sandbox.active_leases += 1
+                if session_id:
+                    sandbox.session_id = session_id
+                    self._sessions[session_id] = sandbox
+                return sandbox, needs_provisioning
+
+    def _new_sandbox(self) -> Sandbox:
+        port = next(port for port in range(self.base_port, self.base_port + self.max_size) if port not in self._sandboxes)
+        sandbox = Sandbox(f"{self.name_prefix}-{port}", port)
+        self._sandboxes[port] = sandbox
+        return sandbox
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _replenish(self) -> None:
+        async with self._condition:
+            missing = min(self.warm_size - len(self._idle), self.max_size - len(self._sandboxes))
+            pending = [self._new_sandbox() for _ in range(max(missing, 0))]
+
+        await asyncio.gather(*(self._provision_idle(sandbox) for sandbox in pending))
+
+    async def _provision_idle(self, sandbox: Sandbox) -> None:
+        try:
+            await self._provision(sandbox)
+        except Exception as error:
+            logger.error(f"Failed to provision sandbox {sandbox.name}: {error}")
+            await self._forget(sandbox)
+            return
+
+        async with self._condition:
+            if self._sandboxes.get(sandbox.port) is not sandbox:
+                return
+            sandbox.state = "idle"
+            sandbox.last_used = asyncio.get_running_loop().time()
+            self._idle.appendleft(sandbox)
+            self._condition.notify()
+
+    async def _recycle(self, sandbox: Sandbox) -> None:
+        self.recycled += 1
+        await self._destroy(sandbox)
+
+        async with self._condition:
+            keep = len(self._idle) < self.warm_size
+            if not keep:
+                self._sandboxes.pop(sandbox.port, None)
+                self._condition.notify()
+
+        if keep:
+            await self._provision_idle(sandbox)
+
+    async def _forget(self, sandbox: Sandbox) -> None:
+        self.provision_failures += 1
+        await self._destroy(sandbox)
+        sandbox.ready.set()
+
+        async with self._condition:
+            self._sandboxes.pop(sandbox.port, None)
+            if sandbox.session_id and self._sessions.get(sandbox.session_id) is sandbox:
+                del self._sessions[sandbox.session_id]
+            self._condition.notify()
+
+    async def _provision(self, sandbox: Sandbox) -> None:
+        sandbox.state = "starting"
+
+        await self._docker("rm", "-f", sandbox.name, check=False)
+        await self._docker(
+            "run", "-d",
+            "--name", sandbox.name,
+            "--label", f"{self.name_prefix}=1",
+            "-p", f"{sandbox.port}:22",
+            "-v", f"{os.path.abspath(settings.host_shared_data_path)}:{settings.container_shared_data_path}",
+            "-e", f"SSH_ROOT_PASSWORD={settings.ssh_password}",
+            self.image
+        )
+
+        await self._wait_until_ready(sandbox)
+
+        sandbox.ssh_pool = SSHConnectionPool(settings.ssh_host, sandbox.port)
+        await sandbox.ssh_pool.start()
+
+        sandbox.ready.set()
+        self.provisioned += 1
+        logger.info(f"Sandbox {sandbox.name} is ready on port {sandbox.port}")
+
+    async def _destroy(self, sandbox: Sandbox) -> None:
+        sandbox.ready.clear()
+        if sandbox.ssh_pool:
+            await sandbox.ssh_pool.close()
+            sandbox.ssh_pool = None
+
+        try:
+            await self._docker("rm", "-f", sandbox.name, check=False)
+        except Exception as error:
+            logger.warning(f"Failed to remove sandbox {sandbox.name}: {error}")
+
+    async def _wait_until_ready(self, sandbox: Sandbox) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.start_timeout
+
+        while loop.time() < deadline:
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(settings.ssh_host, sandbox.port), timeout=2)
+                try:
+                    banner = await asyncio.wait_for(reader.readline(), timeout=2)
+                finally:
+                    writer.close()
+                if banner.startswith(b"SSH-"):
+                    return
+            except (OSError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(0.5)
+
+        raise TimeoutError(f"sshd in {sandbox.name} did not come up within {self.start_timeout}s")
+
+    async def _remove_stale_containers(self) -> None:
+        try:
+            container_ids = await self._docker("ps", "-aq", "--filter", f"label={self.name_prefix}")
+        except Exception as error:
+            logger.warning(f"Could not list stale sandboxes: {error}")
+            return
+
+        if container_ids:
+            await self._docker("rm", "-f", *container_ids.split(), check=False)
+            logger.info(f"Removed {len(container_ids.split())} stale sandbox containers")
+
+    async def _maintenance_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                await self._expire_sessions()
+                await self._shrink_idle()
+                await self._replenish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"Sandbox pool maintenance failed: {error}")
+
+    async def _expire_sessions(self) -> None:
+        now = asyncio.get_running_loop().time()
+        expired = [
+            session_id for session_id, sandbox in self._sessions.items()
+            if sandbox.active_leases == 0 and now - sandbox.last_used > self.session_idle_timeout
+        ]
+        for session_id in expired:
+            await self.end_session(session_id)
+
+    async def _shrink_idle(self) -> None:
+        now = asyncio.get_running_loop().time()
+        removed = []
+
+        async with self._condition:
+            while len(self._idle) > self.warm_size and now - self._idle[-1].last_used > self.idle_timeout:
+                sandbox = self._idle.pop()
+                self._sandboxes.pop(sandbox.port, None)
+                removed.append(sandbox)
+
+        for sandbox in removed:
+            await self._destroy(sandbox)
+
+        if removed:
+            logger.info(f"Shrunk sandbox pool by {len(removed)} idle containers")
+
+    @staticmethod
+    async def _docker(*args: str, check: bool = True) -> str:
+        process = await asyncio.create_subprocess_exec(
+            "docker", *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+
+        if check and process.returncode != 0:
+            raise RuntimeError(f"docker {args[0]} failed: {stderr.decode(errors='replace').strip()}")
+        return stdout.decode(errors="replace").strip()
+
+
+sandbox_pool = SandboxPool()
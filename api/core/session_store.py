@@ -0,0 +1,117 @@
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from api.config.settings import settings
+from api.core.command_cache import command_cache
+from api.core.sandbox_pool import sandbox_pool
+from api.utils.logger import logger
+
+
+class Session:
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.messages: List[Dict[str, Any]] = []
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.command_cache = command_cache.scope()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "created_at": int(self.created_at),
+            "message_count": len(self.messages),
+            "busy": self.lock.locked(),
+            "command_cache": self.command_cache.stats() if self.command_cache else None
+        }
+
+
+class SessionStore:
+    def __init__(self):
+        self.ttl = settings.session_ttl
+        self.max_sessions = max(settings.session_max_count, 1)
+        self.max_messages = settings.session_max_messages
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+        self.created = 0
+        self.evicted = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "created": self.created,
+            "evicted": self.evicted
+        }
+
+    async def create(self) -> Session:
+        await self._evict()
+
+        session = Session(f"sess-{uuid.uuid4()}")
+        self._sessions[session.id] = session
+        self.created += 1
+
+        while len(self._sessions) > self.max_sessions:
+            oldest_id = next(iter(self._sessions))
+            await self._remove(oldest_id)
+            self.evicted += 1
+
+        return session
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        await self._evict()
+
+        session = self._sessions.get(session_id)
+        if session:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    async def delete(self, session_id: str) -> bool:
+        if session_id not in self._sessions:
+            return False
+        await self._remove(session_id)
+        return True
+
+    async def save(self, session: Session, messages: List[Dict[str, Any]]) -> None:
+        if self.max_messages > 0 and len(messages) > self.max_messages:
+            messages = self._trim(messages)
+
+        session.messages = messages
+        session.last_used = time.monotonic()
+
+    def _trim(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        cut = len(messages) - self.max_messages
+        while cut < len(messages) and messages[cut].get("role") != "user":
+            cut += 1
+        if cut < len(messages):
+            return messages[cut:]
+
+        last_user = max((index for index, message in enumerate(messages) if message.get("role") == "user"), default=None)
+        return messages[last_user:] if last_user is not None else []
+
+    async def _remove(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        await sandbox_pool.end_session(session_id)
+
+    async def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if now - session.last_used > self.ttl and not session.lock.locked()
+        ]
+
+        for session_id in expired:
+            await self._remove(session_id)
+
+        if expired:
+            self.evicted += len(expired)
+            logger.info(f"Evicted {len(expired)} expired sessions")
+
+
+session_store = SessionStore()
@@ -1,94 +1,892 @@
-import os
+import time
+import uuid
 import asyncio
+import weakref
 import asyncssh
-import aiofiles
-from datetime import datetime
-from typing import Tuple, Optional
+import shlex
+import posixpath
+from collections import deque
+from typing import Tuple, Optional, Deque, Dict, Any, List, Union, NamedTuple, AsyncGenerator, AsyncIterable
 
 from api.config.settings import settings
+from api.core.audit import audit_log
+from api.core.command_cache import CommandResultCache
+from api.core.metrics import metrics
+from api.core.output_capture import OutputCapture
 from api.utils.logger import logger
 
 
-class AsyncSSHExecutor:
-    def __init__(self):
-        self.host = settings.ssh_host
-        self.port = settings.ssh_port
+BROKEN_CHANNEL_ERRORS = (
+    asyncssh.ChannelOpenError,
+    asyncssh.ConnectionLost,
+    asyncssh.DisconnectError,
+    BrokenPipeError,
+    ConnectionResetError
+)
+
+
+class CommandChunk(NamedTuple):
+    stream: str
+    data: str
+
+
+async def end_of_stream(queue: asyncio.Queue) -> None:
+    task = asyncio.current_task()
+    if task and task.cancelling():
+        return
+    await queue.put(None)
+
+
+class CommandResult(NamedTuple):
+    exit_code: int
+    stdout: str
+    stderr: str
+
+
+class RemoteFileEntry(NamedTuple):
+    name: str
+    type: str
+    size: int
+    mtime: int
+
+
+FILE_TYPES = {
+    asyncssh.FILEXFER_TYPE_REGULAR: "file",
+    asyncssh.FILEXFER_TYPE_DIRECTORY: "dir",
+    asyncssh.FILEXFER_TYPE_SYMLINK: "link"
+}
+
+
+class SSHConnectionPool:
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None):
+        self.host = host or settings.ssh_host
+        self.port = port or settings.ssh_port
         self.username = settings.ssh_username
         self.password = settings.ssh_password
 
-        self.connection: Optional[asyncssh.SSHClientConnection] = None
-        self.command_timeout = 60.0
-        self.audit_log_path = os.path.join(os.path.dirname(settings.log_file), "audit.log")
+        self.min_size = settings.ssh_pool_min_size
+        self.max_size = max(settings.ssh_pool_max_size, self.min_size, 1)
+        self.idle_timeout = settings.ssh_pool_idle_timeout
+        self.acquire_timeout = settings.ssh_pool_acquire_timeout
+        self.keepalive_interval = settings.ssh_keepalive_interval
 
-    async def __aenter__(self):
-        await self.connect()
-        return self
+        self._idle: Deque[Tuple[asyncssh.SSHClientConnection, float]] = deque()
+        self._size = 0
+        self._condition = asyncio.Condition()
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._sftp_clients: "weakref.WeakKeyDictionary[asyncssh.SSHClientConnection, asyncssh.SFTPClient]" = weakref.WeakKeyDictionary()
 
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.disconnect()
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.connections_evicted = 0
+        self.connections_discarded = 0
+        self.connect_failures = 0
+        self.connect_time_total = 0.0
+        self.sftp_sessions_opened = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    @property
+    def in_use(self) -> int:
+        return self._size - len(self._idle)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": f"{self.host}:{self.port}",
+            "size": self.size,
+            "idle": self.idle_count,
+            "in_use": self.in_use,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "opened": self.connections_opened,
+            "reused": self.connections_reused,
+            "evicted": self.connections_evicted,
+            "discarded": self.connections_discarded,
+            "connect_failures": self.connect_failures,
+            "sftp_sessions": len(self._sftp_clients),
+            "sftp_sessions_opened": self.sftp_sessions_opened,
+            "avg_connect_seconds": round(self.connect_time_total / self.connections_opened, 4) if self.connections_opened else 0.0
+        }
+
+    async def start(self) -> None:
+        self._closed = False
+        try:
+            await self._fill_to_min_size()
+        except Exception as error:
+            logger.warning(f"SSH pool warm-up failed, will retry in background: {error}")
+
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+        logger.info(f"SSH connection pool started for {self.host}:{self.port} ({self.size} warm connections)")
+
+    async def close(self) -> None:
+        self._closed = True
+
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+
+        async with self._condition:
+            idle_connections = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle_connections)
+            self._condition.notify_all()
+
+        for connection in idle_connections:
+            await self._close_connection(connection)
+
+        logger.info(f"SSH connection pool for {self.host}:{self.port} closed")
+
+    async def acquire(self) -> asyncssh.SSHClientConnection:
+        if self._closed:
+            raise ConnectionError("SSH connection pool is closed")
+
+        try:
+            connection = await asyncio.wait_for(self._reserve_slot(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"Timed out waiting for a free SSH connection after {self.acquire_timeout}s")
+
+        if connection:
+            self.connections_reused += 1
+            return connection
+
+        try:
+            return await self._open_connection()
+        except Exception:
+            await self._release_slot()
+            raise
+
+    async def release(self, connection: asyncssh.SSHClientConnection, discard: bool = False) -> None:
+        if discard or self._closed or connection.is_closed():
+            self.connections_discarded += 1
+            await self._release_slot()
+            await self._close_connection(connection)
+            return
+
+        async with self._condition:
+            self._idle.append((connection, asyncio.get_running_loop().time()))
+            self._condition.notify()
+
+    async def sftp(self, connection: asyncssh.SSHClientConnection) -> asyncssh.SFTPClient:
+        client = self._sftp_clients.get(connection)
+        if client is None:
+            client = await connection.start_sftp_client()
+            self._sftp_clients[connection] = client
+            self.sftp_sessions_opened += 1
+        return client
+
+    async def _reserve_slot(self) -> Optional[asyncssh.SSHClientConnection]:
+        async with self._condition:
+            while True:
+                while self._idle:
+                    connection, _ = self._idle.pop()
+                    if not connection.is_closed():
+                        return connection
+                    self._size -= 1
+                    self.connections_discarded += 1
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+
+                await self._condition.wait()
+
+    async def _release_slot(self) -> None:
+        async with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    async def _open_connection(self) -> asyncssh.SSHClientConnection:
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
 
-    async def connect(self) -> None:
         try:
             logger.info(f"Initiating SSH connection to {self.host}:{self.port}")
-            self.connection = await asyncssh.connect(
+            connection = await asyncssh.connect(
                 self.host,
                 port=self.port,
                 username=self.username,
                 password=self.password,
-                known_hosts=None
+                known_hosts=None,
+                keepalive_interval=self.keepalive_interval,
+                keepalive_count_max=3
             )
-
-            logger.info("SSH connection established successfully")
         except Exception as error:
+            self.connect_failures += 1
+            metrics.error("ssh_connect", error)
             logger.critical(f"SSH Connection failed: {error}")
             raise ConnectionError(f"Could not connect to isolated environment: {error}")
 
-    async def disconnect(self) -> None:
-        if self.connection:
-            self.connection.close()
-            await self.connection.wait_closed()
-            logger.info("SSH connection closed")
-
-    async def _log_audit(self, command: str, input_data: str, stdout: str, stderr: str, exit_code: int):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        entry = (
-            f"[{timestamp}] CMD: {command}\n"
-            f"IN: {input_data[:50]}...\n"
-            f"OUT: {stdout[:100]}...\n"
-            f"ERR: {stderr[:100]}...\n"
-            f"CODE: {exit_code}\n"
-            f"{'=' * 50}\n"
-        )
+        connect_time = loop.time() - started_at
+        self.connections_opened += 1
+        self.connect_time_total += connect_time
+        metrics.ssh_connect_duration.observe(connect_time)
+        logger.info("SSH connection established successfully")
+        return connection
+
+    @staticmethod
+    async def _close_connection(connection: asyncssh.SSHClientConnection) -> None:
         try:
-            async with aiofiles.open(self.audit_log_path, mode="a", encoding="utf-8") as f:
-                await f.write(entry)
+            connection.close()
+            await connection.wait_closed()
         except Exception as error:
-            logger.warning(f"Failed to write audit log: {error}")
+            logger.debug(f"Error while closing SSH connection: {error}")
 
-    async def execute_command(self, command: str, input_data: Optional[str] = None) -> Tuple[int, str, str]:
-        if not self.connection:
-            await self.connect()
+    async def _fill_to_min_size(self) -> None:
+        while not self._closed:
+            async with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+
+            try:
+                connection = await self._open_connection()
+            except Exception:
+                await self._release_slot()
+                raise
+
+            async with self._condition:
+                self._idle.appendleft((connection, asyncio.get_running_loop().time()))
+                self._condition.notify()
+
+    async def _evict_idle(self) -> None:
+        now = asyncio.get_running_loop().time()
+        evicted = []
+
+        async with self._condition:
+            kept: Deque[Tuple[asyncssh.SSHClientConnection, float]] = deque()
+            for connection, released_at in self._idle:
+                is_dead = connection.is_closed()
+                is_stale = now - released_at > self.idle_timeout and self._size - len(evicted) > self.min_size
+                if is_dead or is_stale:
+                    evicted.append(connection)
+                else:
+                    kept.append((connection, released_at))
+
+            self._idle = kept
+            self._size -= len(evicted)
+            self.connections_evicted += len(evicted)
+            if evicted:
+                self._condition.notify_all()
+
+        for connection in evicted:
+            await self._close_connection(connection)
+
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} idle SSH connections")
+
+    async def _maintenance_loop(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await self._evict_idle()
+                await self._fill_to_min_size()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"SSH pool maintenance failed: {error}")
+
+
+ssh_pool = SSHConnectionPool()
+
+
+class ShellExited(Exception):
+    def __init__(self, exit_code: int):
+        super().__init__(f"Persistent shell exited with status {exit_code}")
+        self.exit_code = exit_code
+
+
+class PersistentShell:
+    def __init__(self, connection: asyncssh.SSHClientConnection):
+        self.connection = connection
+        self.process: Optional[asyncssh.SSHClientProcess] = None
+        self.pid: Optional[str] = None
+        self.interrupt_grace = settings.persistent_shell_interrupt_grace
+        self.read_size = 8192
+
+        self._lock = asyncio.Lock()
+        self._buffers = {"stdout": "", "stderr": ""}
+        self._markers: Dict[str, str] = {}
+        self._recovery: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.exit_status is None and not self.connection.is_closed()
+
+    async def start(self) -> None:
+        self.process = await self.connection.create_process("bash --noprofile --norc")
+
+        self.process.stdin.write("printf '__IA_READY %s\\n' \"$$\"\n")
+        line = await asyncio.wait_for(self.process.stdout.readline(), timeout=self.interrupt_grace)
+        if not line.startswith("__IA_READY "):
+            raise ConnectionError(f"Persistent shell did not start: {line!r}")
+
+        self.pid = line.split()[1]
+        logger.info(f"Started persistent shell (pid {self.pid})")
+
+    async def settle(self) -> None:
+        if self._recovery:
+            await asyncio.shield(self._recovery)
+
+    async def close(self) -> None:
+        if self._recovery and not self._recovery.done() and self._recovery is not asyncio.current_task():
+            self._recovery.cancel()
+        if self.process:
+            process, self.process = self.process, None
+            process.close()
+            try:
+                await asyncio.wait_for(process.wait_closed(), timeout=self.interrupt_grace)
+            except Exception as error:
+                logger.debug(f"Error while closing persistent shell: {error}")
+
+    async def run(self, command: str, input_data: Optional[str], queue: asyncio.Queue) -> int:
+        async with self._lock:
+            await self.settle()
+            if not self.alive:
+                raise ShellExited(1)
+
+            token = f"__IA_{uuid.uuid4().hex}"
+            stdin = f"<<'{token}_IN'\n{input_data}{token}_IN" if input_data else "< /dev/null"
+            self._markers = {"stdout": f"\n{token} ", "stderr": f"\n{token}\n"}
+
+            self.process.stdin.write(
+                f"eval {shlex.quote(command)} {stdin}\n"
+                f"printf '\\n{token} %d\\n' \"$?\"; printf '\\n{token}\\n' >&2\n"
+            )
+
+            try:
+                status, _ = await asyncio.gather(self._read_frame("stdout", queue), self._read_frame("stderr", queue))
+            except asyncio.CancelledError:
+                self._recovery = asyncio.ensure_future(self._recover())
+                raise
+            finally:
+                await end_of_stream(queue)
+                await end_of_stream(queue)
+
+            return int(status) if status.lstrip("-").isdigit() else 1
+
+    async def _read_frame(self, stream: str, queue: Optional[asyncio.Queue]) -> str:
+        reader = self.process.stdout if stream == "stdout" else self.process.stderr
+        marker = self._markers[stream]
+        buffer = self._buffers[stream]
 
         try:
-            logger.info(f"Executing: {command}")
+            while True:
+                position = buffer.find(marker)
+                if position >= 0:
+                    if position and queue:
+                        await queue.put(CommandChunk(stream, buffer[:position]))
+                    buffer = buffer[position + len(marker):]
+
+                    status = ""
+                    if stream == "stdout":
+                        while "\n" not in buffer:
+                            buffer += await self._read(reader)
+                        status, buffer = buffer.split("\n", 1)
+
+                    del self._markers[stream]
+                    return status
+
+                safe = len(buffer) - len(marker) + 1
+                if safe > 0:
+                    if queue:
+                        await queue.put(CommandChunk(stream, buffer[:safe]))
+                    buffer = buffer[safe:]
 
-            if input_data and not input_data.endswith("\n"):
-                input_data += "\n"
+                try:
+                    buffer += await self._read(reader)
+                except ShellExited:
+                    if buffer and queue:
+                        await queue.put(CommandChunk(stream, buffer))
+                    buffer = ""
+                    raise
+        finally:
+            self._buffers[stream] = buffer
 
-            process = await asyncio.wait_for(
-                self.connection.run(command, input=input_data, check=False),
-                timeout=self.command_timeout
+    async def _read(self, reader: asyncssh.SSHReader) -> str:
+        data = await reader.read(self.read_size)
+        if not data:
+            process = self.process
+            if process:
+                await process.wait_closed()
+            raise ShellExited(process.exit_status if process and process.exit_status is not None else 1)
+        return data
+
+    async def _recover(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        for signal in ("TERM", "KILL"):
+            await self._signal_foreground(signal)
+            deadline = loop.time() + self.interrupt_grace
+            try:
+                for stream in list(self._markers):
+                    await asyncio.wait_for(self._read_frame(stream, None), timeout=max(deadline - loop.time(), 0))
+                logger.info(f"Interrupted foreground job in persistent shell with SIG{signal}, shell state kept")
+                return
+            except asyncio.TimeoutError:
+                continue
+            except Exception as error:
+                logger.debug(f"Persistent shell did not survive the interruption: {error}")
+                break
+
+        logger.warning("Persistent shell is unresponsive, discarding it")
+        await self.close()
+
+    async def _signal_foreground(self, signal: str) -> None:
+        if not self.pid or self.connection.is_closed():
+            return
+        try:
+            await asyncio.wait_for(
+                self.connection.run(f"pkill -{signal} -P {self.pid}", check=False),
+                timeout=self.interrupt_grace
             )
+        except Exception as error:
+            logger.debug(f"Could not signal persistent shell children: {error}")
+
+
+class AsyncSSHExecutor:
+    def __init__(
+        self,
+        pool: Optional[SSHConnectionPool] = None,
+        request_id: Optional[str] = None,
+        cache: Optional[CommandResultCache] = None,
+        persistent_shell: Optional[bool] = None
+    ):
+        self.pool = pool or ssh_pool
+        self.request_id = request_id
+        self.cache = cache
+        if cache:
+            cache.bind(self.pool)
+        self.persistent_shell = settings.persistent_shell_enabled if persistent_shell is None else persistent_shell
+
+        self.connection: Optional[asyncssh.SSHClientConnection] = None
+        self.shell: Optional[PersistentShell] = None
+        self._shell_reset = False
+        self._reconnect_lock = asyncio.Lock()
+        self._sftp_lock = asyncio.Lock()
+        self._shell_lock = asyncio.Lock()
+        self.command_timeout = 60.0
+        self.stream_chunk_size = 8192
+        self.stream_queue_size = 32
+        self.transfer_chunk_size = settings.sftp_chunk_size
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+
+    async def connect(self) -> None:
+        self.connection = await self.pool.acquire()
+
+    async def disconnect(self, discard: bool = False) -> None:
+        if self.shell:
+            shell, self.shell = self.shell, None
+            await asyncio.shield(shell.close())
+
+        if self.connection:
+            connection, self.connection = self.connection, None
+            await asyncio.shield(self.pool.release(connection, discard=discard))
+
+    async def reconnect(self, broken: Optional[asyncssh.SSHClientConnection]) -> None:
+        async with self._reconnect_lock:
+            if self.connection is not broken:
+                return
+
+            logger.warning("SSH channel is broken, reconnecting")
+            await self.disconnect(discard=True)
+            await self.connect()
+
+    async def _shell(self) -> PersistentShell:
+        connection = self.connection
+        if not connection or connection.is_closed():
+            await self.reconnect(connection)
+
+        async with self._shell_lock:
+            if self.shell and self.shell.connection is self.connection:
+                await self.shell.settle()
+                if self.shell.alive:
+                    return self.shell
+
+            reason = "new"
+            if self.shell:
+                reason = "restart"
+                self._shell_reset = True
+                shell, self.shell = self.shell, None
+                await shell.close()
+                if self.cache:
+                    self.cache.invalidate()
+
+            shell = PersistentShell(self.connection)
+            try:
+                await shell.start()
+            except BaseException:
+                await asyncio.shield(shell.close())
+                raise
+
+            self.shell = shell
+            metrics.persistent_shells_started.labels(reason).inc()
+            return shell
+
+    async def _create_process(self, command: str, input_data: Optional[str] = None) -> asyncssh.SSHClientProcess:
+        connection = self.connection
+        if not connection or connection.is_closed():
+            await self.reconnect(connection)
+
+        connection = self.connection
+        try:
+            return await connection.create_process(command, input=input_data)
+        except BROKEN_CHANNEL_ERRORS:
+            await self.reconnect(connection)
+            return await self.connection.create_process(command, input=input_data)
+
+    def _log_audit(
+        self,
+        command: str,
+        input_data: str,
+        result: CommandResult,
+        step: Optional[int],
+        duration: float,
+        stdout_bytes: int,
+        stderr_bytes: int,
+        cancelled: bool = False,
+        cached: bool = False,
+        spill_paths: Optional[List[str]] = None
+    ) -> None:
+        audit_log.record(
+            "command",
+            request_id=self.request_id,
+            step=step,
+            command=command,
+            duration_ms=round(duration * 1000, 2),
+            exit_code=result.exit_code,
+            stdin_bytes=len(input_data.encode("utf-8")),
+            stdout_bytes=stdout_bytes,
+            stderr_bytes=stderr_bytes,
+            stdout_preview=audit_log.preview(result.stdout),
+            stderr_preview=audit_log.preview(result.stderr),
+            cancelled=cancelled,
+            cached=cached,
+            spill_paths=spill_paths or None
+        )
+
+    async def stream_command(
+        self,
+        command: str,
+        input_data: Optional[str] = None,
+        step: Optional[int] = None
+    ) -> AsyncGenerator[Union[CommandChunk, CommandResult], None]:
+        process = None
+        pumps: List[asyncio.Task] = []
+        label = f"{self.request_id or 'command'}-{step if step is not None else 0}"
+        captures = {"stdout": OutputCapture("stdout", label), "stderr": OutputCapture("stderr", label)}
+        byte_counts = {"stdout": 0, "stderr": 0}
+        started_at = time.perf_counter()
+        result: Optional[CommandResult] = None
+        cache_ticket = None
+
+        if input_data and not input_data.endswith("\n"):
+            input_data += "\n"
+
+        if self.cache:
+            cached = self.cache.lookup(command, input_data)
+            if cached is not None:
+                logger.info(f"Serving cached result: {command}")
+                self._log_audit(
+                    command, input_data or "", cached, step, 0.0,
+                    len(cached.stdout.encode("utf-8")), len(cached.stderr.encode("utf-8")), cached=True
+                )
+                yield cached
+                return
+            cache_ticket = self.cache.begin(command, input_data)
+
+        logger.info(f"Executing: {command}")
+
+        try:
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.stream_queue_size)
+            if self.persistent_shell:
+                shell = await self._shell()
+                if self._shell_reset:
+                    self._shell_reset = False
+                    captures["stderr"].add("[Shell was restarted; working directory and environment were reset]\n")
+                pumps = [asyncio.create_task(shell.run(command, input_data, queue))]
+            else:
+                process = await self._create_process(command, input_data)
+                pumps = [
+                    asyncio.create_task(self._pump_stream("stdout", process.stdout, queue)),
+                    asyncio.create_task(self._pump_stream("stderr", process.stderr, queue))
+                ]
 
-            stdout = str(process.stdout).strip() if process.stdout else ""
-            stderr = str(process.stderr).strip() if process.stderr else ""
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.command_timeout
+            open_streams = 2
 
-            await self._log_audit(command, input_data or "", stdout, stderr, process.exit_status)
+            while open_streams:
+                chunk = await asyncio.wait_for(queue.get(), timeout=max(deadline - loop.time(), 0))
+                if chunk is None:
+                    open_streams -= 1
+                    continue
 
-            return process.exit_status, stdout, stderr
+                captures[chunk.stream].add(chunk.data)
+                await captures[chunk.stream].flush()
+                byte_counts[chunk.stream] += len(chunk.data.encode("utf-8"))
+                yield chunk
+
+            if self.persistent_shell:
+                exit_code = await asyncio.wait_for(pumps[0], timeout=max(deadline - loop.time(), 0))
+            else:
+                completed = await asyncio.wait_for(process.wait(check=False), timeout=max(deadline - loop.time(), 0))
+                exit_code = completed.exit_status if completed.exit_status is not None else 1
+
+            result = CommandResult(exit_code, *await self._captured(captures))
+        except ShellExited as exited:
+            logger.warning(f"Persistent shell exited while running: {command}")
+            captures["stderr"].add(f"\n[Shell exited with status {exited.exit_code}; working directory and environment were reset]")
+            result = CommandResult(exited.exit_code, *await self._captured(captures))
+            shell, self.shell = self.shell, None
+            if shell:
+                await asyncio.shield(shell.close())
+            if self.cache:
+                self.cache.invalidate()
         except asyncio.TimeoutError:
             logger.error(f"Command execution timed out: {command}")
-            return 124, "", "Error: Command timed out"
+            metrics.error("command", "timeout")
+            captures["stderr"].add("\nError: Command timed out")
+            result = CommandResult(124, *await self._captured(captures))
+        except asyncio.CancelledError:
+            logger.warning(f"Command cancelled, terminating remote process: {command}")
+            metrics.commands_cancelled.inc()
+            result = CommandResult(130, *await self._captured(captures))
+            self._log_audit(
+                command, input_data or "", result, step, time.perf_counter() - started_at,
+                byte_counts["stdout"], byte_counts["stderr"], cancelled=True, spill_paths=self._spill_paths(captures)
+            )
+            raise
         except Exception as error:
             logger.error(f"Execution failure: {error}")
-            return 1, "", f"Error: {str(error)}"
+            metrics.error("command", error)
+            result = CommandResult(1, "", f"Error: {str(error)}")
+        finally:
+            for capture in captures.values():
+                await asyncio.shield(capture.close())
+            for pump in pumps:
+                pump.cancel()
+            if process and process.exit_status is None:
+                self._terminate(process)
+            if self.cache:
+                self.cache.finish(cache_ticket, result)
+            if self.persistent_shell and pumps:
+                await asyncio.gather(*pumps, return_exceptions=True)
+
+        duration = time.perf_counter() - started_at
+        metrics.command_duration.observe(duration)
+        metrics.command_output_bytes.observe(byte_counts["stdout"] + byte_counts["stderr"])
+
+        self._log_audit(
+            command, input_data or "", result, step, duration,
+            byte_counts["stdout"], byte_counts["stderr"], spill_paths=self._spill_paths(captures)
+        )
+
+        yield result
+
+    @staticmethod
+    async def _captured(captures: Dict[str, OutputCapture]) -> Tuple[str, str]:
+        for capture in captures.values():
+            await asyncio.shield(capture.close())
+        return captures["stdout"].text().strip(), captures["stderr"].text().strip()
+
+    @staticmethod
+    def _spill_paths(captures: Dict[str, OutputCapture]) -> List[str]:
+        return [capture.spill_path for capture in captures.values() if capture.spill_path]
+
+    @staticmethod
+    def _terminate(process: asyncssh.SSHClientProcess) -> None:
+        try:
+            process.terminate()
+        except Exception as error:
+            logger.debug(f"Could not signal remote process: {error}")
+        process.close()
+
+    async def execute_command(self, command: str, input_data: Optional[str] = None, step: Optional[int] = None) -> Tuple[int, str, str]:
+        result = CommandResult(1, "", "Error: Command produced no result")
+
+        async for event in self.stream_command(command, input_data, step):
+            if isinstance(event, CommandResult):
+                result = event
+
+        return result
+
+    async def _sftp(self) -> asyncssh.SFTPClient:
+        connection = self.connection
+        if not connection or connection.is_closed():
+            await self.reconnect(connection)
+
+        async with self._sftp_lock:
+            return await self.pool.sftp(self.connection)
+
+    def _log_file_audit(self, operation: str, path: str, size: int, step: Optional[int], duration: float, error: Optional[str] = None) -> None:
+        audit_log.record(
+            "file",
+            request_id=self.request_id,
+            step=step,
+            operation=operation,
+            path=path,
+            bytes=size,
+            duration_ms=round(duration * 1000, 2),
+            error=error
+        )
+
+    async def write_file(
+        self,
+        path: str,
+        data: Union[bytes, AsyncIterable[bytes]],
+        append: bool = False,
+        step: Optional[int] = None
+    ) -> int:
+        started_at = time.perf_counter()
+        cache_ticket = self.cache.begin(f"write_file {path}", None) if self.cache else None
+        written = 0
+        error = None
+
+        try:
+            sftp = await self._sftp()
+            directory = posixpath.dirname(path)
+            if directory:
+                await sftp.makedirs(directory, exist_ok=True)
+
+            target = path if append else f"{path}.part-{uuid.uuid4().hex[:8]}"
+            try:
+                async with sftp.open(target, "ab" if append else "wb", encoding=None) as file:
+                    if isinstance(data, bytes):
+                        await file.write(data)
+                        written = len(data)
+                    else:
+                        async for chunk in data:
+                            await file.write(chunk)
+                            written += len(chunk)
+
+                if not append:
+                    await self._replace(sftp, target, path)
+            except BaseException:
+                if not append:
+                    await asyncio.shield(self._remove_quietly(sftp, target))
+                raise
+        except Exception as exception:
+            error = str(exception)
+            metrics.error("sftp", exception)
+            raise
+        finally:
+            if self.cache:
+                self.cache.finish(cache_ticket, None)
+            self._log_file_audit("write", path, written, step, time.perf_counter() - started_at, error)
+
+        metrics.sftp_bytes.labels("upload").inc(written)
+        logger.info(f"Wrote {written} bytes to {path} over SFTP")
+        return written
+
+    @classmethod
+    async def _replace(cls, sftp: asyncssh.SFTPClient, source: str, destination: str) -> None:
+        try:
+            await sftp.posix_rename(source, destination)
+        except asyncssh.SFTPOpUnsupported:
+            await cls._remove_quietly(sftp, destination)
+            await sftp.rename(source, destination)
+
+    @staticmethod
+    async def _remove_quietly(sftp: asyncssh.SFTPClient, path: str) -> None:
+        try:
+            await sftp.remove(path)
+        except (asyncssh.SFTPError, OSError):
+            pass
+
+    async def file_size(self, path: str) -> int:
+        sftp = await self._sftp()
+        attributes = await sftp.stat(path)
+        if attributes.type == asyncssh.FILEXFER_TYPE_DIRECTORY:
+            raise asyncssh.SFTPFileIsADirectory(f"{path} is a directory")
+        return attributes.size or 0
+
+    async def iter_file(
+        self,
+        path: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        step: Optional[int] = None
+    ) -> AsyncGenerator[bytes, None]:
+        started_at = time.perf_counter()
+        sent = 0
+        error = None
+
+        try:
+            sftp = await self._sftp()
+            async with sftp.open(path, "rb", encoding=None) as file:
+                position = offset
+                while length is None or sent < length:
+                    size = self.transfer_chunk_size if length is None else min(self.transfer_chunk_size, length - sent)
+                    chunk = await file.read(size, position)
+                    if not chunk:
+                        break
+                    position += len(chunk)
+                    sent += len(chunk)
+                    yield chunk
+        except Exception as exception:
+            error = str(exception)
+            metrics.error("sftp", exception)
+            raise
+        finally:
+            metrics.sftp_bytes.labels("download").inc(sent)
+            self._log_file_audit("read", path, sent, step, time.perf_counter() - started_at, error)
+
+    async def read_file(self, path: str, offset: int = 0, length: Optional[int] = None, step: Optional[int] = None) -> bytes:
+        parts = []
+        async for chunk in self.iter_file(path, offset, length, step):
+            parts.append(chunk)
+        return b"".join(parts)
+
+    async def list_dir(self, path: str = ".", step: Optional[int] = None) -> List[RemoteFileEntry]:
+        started_at = time.perf_counter()
+        sftp = await self._sftp()
+
+        try:
+            names = await sftp.readdir(path)
+        except Exception as exception:
+            metrics.error("sftp", exception)
+            self._log_file_audit("list", path, 0, step, time.perf_counter() - started_at, str(exception))
+            raise
+
+        entries = [
+            RemoteFileEntry(
+                name.filename,
+                FILE_TYPES.get(name.attrs.type, "other"),
+                name.attrs.size or 0,
+                name.attrs.mtime or 0
+            )
+            for name in names if name.filename not in (".", "..")
+        ]
+        entries.sort(key=lambda entry: (entry.type != "dir", entry.name))
+
+        self._log_file_audit("list", path, len(entries), step, time.perf_counter() - started_at)
+        return entries
+
+    async def _pump_stream(self, stream: str, reader: asyncssh.SSHReader, queue: asyncio.Queue) -> None:
+        try:
+            while True:
+                data = await reader.read(self.stream_chunk_size)
+                if not data:
+                    break
+                await queue.put(CommandChunk(stream, data))
+        finally:
+            await end_of_stream(queue)
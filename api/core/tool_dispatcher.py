@@ -0,0 +1,143 @@
+import json
+import asyncio
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+
+from api.config.settings import settings
+from api.core.disconnect import DisconnectMonitor
+from api.core.metrics import metrics
+from api.utils.logger import logger
+
+
+_TOOL_CALL_DONE = object()
+
+
+class ArgumentTracker:
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, fragment: str) -> bool:
+        closed = False
+
+        for char in fragment:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.started = True
+            elif char in "}]":
+                self.depth -= 1
+                closed = self.started and self.depth == 0
+
+        return closed
+
+
+class ToolCallDispatcher:
+    def __init__(
+        self,
+        run_tool: Callable[[Dict[str, Any], Callable[[Any], None]], Awaitable[Dict[str, Any]]],
+        monitor: DisconnectMonitor,
+        speculative: Optional[bool] = None
+    ):
+        self.run_tool = run_tool
+        self.speculative = settings.speculative_tool_calls if speculative is None else speculative
+        self.parallelism = max(settings.max_parallel_tool_calls, 1)
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.parallelism)
+        self._trackers: Dict[int, ArgumentTracker] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._results: Dict[int, Dict[str, Any]] = {}
+        self._remaining = 0
+        self.dispatched_early = 0
+
+        self._unregister = monitor.on_disconnect(self.cancel)
+
+    def observe(self, index: int, tool_calls: Dict[int, Dict[str, Any]], fragment: Optional[str]) -> None:
+        if not self.speculative:
+            return
+
+        if index not in self._trackers:
+            for previous in list(self._trackers):
+                self._dispatch(previous, tool_calls[previous], early=True)
+            self._trackers[index] = ArgumentTracker()
+
+        if fragment and self._trackers[index].feed(fragment):
+            tool_call = tool_calls[index]
+            try:
+                json.loads(tool_call["function"]["arguments"])
+            except json.JSONDecodeError:
+                return
+            self._dispatch(index, tool_call, early=True)
+
+    def finish(self, tool_calls: Dict[int, Dict[str, Any]]) -> None:
+        for index, tool_call in tool_calls.items():
+            self._dispatch(index, tool_call, early=False)
+
+        if len(tool_calls) > 1:
+            logger.info(
+                f"Executing {len(tool_calls)} tool calls with parallelism {self.parallelism} "
+                f"({self.dispatched_early} started while the model was still streaming)"
+            )
+
+    def drain(self) -> List[Any]:
+        events = []
+        while not self._queue.empty():
+            event = self._queue.get_nowait()
+            if event is _TOOL_CALL_DONE:
+                self._remaining -= 1
+            else:
+                events.append(event)
+        return events
+
+    async def events(self) -> AsyncGenerator[Any, None]:
+        try:
+            while self._remaining:
+                event = await self._queue.get()
+                if event is _TOOL_CALL_DONE:
+                    self._remaining -= 1
+                    continue
+                yield event
+        finally:
+            self.close()
+
+    def messages(self, tool_calls: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self._results[index] for index in tool_calls if index in self._results]
+
+    def cancel(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+
+    def close(self) -> None:
+        self._unregister()
+        self.cancel()
+
+    def _dispatch(self, index: int, tool_call: Dict[str, Any], early: bool) -> None:
+        if index in self._tasks:
+            return
+
+        if early:
+            if not tool_call["id"] or not tool_call["function"]["name"]:
+                return
+            self.dispatched_early += 1
+            metrics.tool_calls_dispatched_early.inc()
+            logger.debug(f"Dispatching tool call {tool_call['id']} before the model finished streaming")
+
+        self._remaining += 1
+        self._tasks[index] = asyncio.create_task(self._run(index, tool_call))
+
+    async def _run(self, index: int, tool_call: Dict[str, Any]) -> None:
+        try:
+            async with self._semaphore:
+                self._results[index] = await self.run_tool(tool_call, self._queue.put_nowait)
+        finally:
+            self._queue.put_nowait(_TOOL_CALL_DONE)
@@ -0,0 +1,235 @@
+import math
+import random
+import asyncio
+import importlib.util
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Set
+
+import httpx
+from openai import (
+    AsyncOpenAI,
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError
+)
+
+from api.config.settings import settings
+from api.core.metrics import metrics
+from api.utils.logger import logger
+
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+TTFT_WINDOW = 500
+
+
+class PrimedStream:
+    def __init__(self, stream: Any, first: Optional[Any]):
+        self.stream = stream
+        self._first = first
+        self._iterator = stream.__aiter__()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._first is not None:
+            chunk, self._first = self._first, None
+            return chunk
+        return await self._iterator.__anext__()
+
+    async def close(self) -> None:
+        await self.stream.close()
+
+
+class UpstreamClient:
+    def __init__(self):
+        self.max_retries = max(settings.upstream_max_retries, 0)
+        self.retry_base_delay = settings.upstream_retry_base_delay
+        self.retry_max_delay = settings.upstream_retry_max_delay
+
+        self.hedge_enabled = settings.upstream_hedge_enabled
+        self.hedge_percentile = min(max(settings.upstream_hedge_percentile, 1.0), 100.0)
+        self.hedge_min_delay = settings.upstream_hedge_min_delay
+        self.hedge_min_samples = max(settings.upstream_hedge_min_samples, 1)
+
+        self.http2 = settings.upstream_http2 and self._http2_available()
+        self.http_client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=settings.upstream_max_connections,
+                max_keepalive_connections=settings.upstream_max_keepalive_connections,
+                keepalive_expiry=settings.upstream_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(settings.upstream_read_timeout, connect=settings.upstream_connect_timeout)
+        )
+        self.client = AsyncOpenAI(
+            base_url=settings.openrouter_base_url,
+            api_key=settings.openrouter_api_key,
+            http_client=self.http_client,
+            max_retries=0
+        )
+
+        self._ttft: Deque[float] = deque(maxlen=TTFT_WINDOW)
+        self._discards: Set[asyncio.Task] = set()
+
+        self.streams_opened = 0
+        self.retries = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    @staticmethod
+    def _http2_available() -> bool:
+        if importlib.util.find_spec("h2") is None:
+            logger.warning("UPSTREAM_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": settings.openrouter_base_url,
+            "http2": self.http2,
+            "streams_opened": self.streams_opened,
+            "retries": self.retries,
+            "hedging": self.hedge_enabled,
+            "hedge_delay_s": round(self.hedge_delay(), 3) if self.hedge_delay() is not None else None,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won
+        }
+
+    async def close(self) -> None:
+        if self._discards:
+            await asyncio.gather(*self._discards, return_exceptions=True)
+        await self.http_client.aclose()
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge_enabled or len(self._ttft) < self.hedge_min_samples:
+            return None
+
+        ordered = sorted(self._ttft)
+        index = min(math.ceil(len(ordered) * self.hedge_percentile / 100) - 1, len(ordered) - 1)
+        return max(ordered[max(index, 0)], self.hedge_min_delay)
+
+    async def stream(self, **params: Any) -> PrimedStream:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._open_with_retries(params)
+
+        primary = asyncio.create_task(self._open_with_retries(params))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except BaseException:
+            self._abandon([primary])
+            raise
+        if done:
+            return primary.result()
+
+        self.hedges_fired += 1
+        metrics.upstream_hedges.labels("fired").inc()
+        logger.info(f"Upstream first token exceeded {delay:.2f}s, sending hedged request")
+        hedge = asyncio.create_task(self._open_with_retries(params))
+
+        return await self._race(primary, hedge)
+
+    async def _race(self, primary: asyncio.Task, hedge: asyncio.Task) -> PrimedStream:
+        pending = {primary, hedge}
+        losers: Set[asyncio.Task] = set()
+        error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                opened = [task for task in done if task.exception() is None]
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+
+                if opened:
+                    winner = primary if primary in opened else hedge
+                    losers.update(task for task in opened if task is not winner)
+                    if winner is hedge:
+                        self.hedges_won += 1
+                        metrics.upstream_hedges.labels("won").inc()
+                    return winner.result()
+        finally:
+            self._abandon(pending | losers)
+
+        raise error
+
+    def _abandon(self, tasks: Iterable[asyncio.Task]) -> None:
+        tasks = list(tasks)
+        if not tasks:
+            return
+
+        for task in tasks:
+            task.cancel()
+        discard = asyncio.ensure_future(self._discard(tasks))
+        self._discards.add(discard)
+        discard.add_done_callback(self._discards.discard)
+
+    @staticmethod
+    async def _discard(tasks) -> None:
+        for task in tasks:
+            try:
+                stream = await task
+            except BaseException:
+                continue
+            await stream.close()
+
+    async def _open_with_retries(self, params: Dict[str, Any]) -> PrimedStream:
+        attempt = 0
+        while True:
+            try:
+                return await self._open(params)
+            except Exception as error:
+                retry_after = self._retry_delay(error, attempt)
+                if retry_after is None or attempt >= self.max_retries:
+                    raise
+
+                attempt += 1
+                self.retries += 1
+                metrics.upstream_retries.labels(self._retry_reason(error)).inc()
+                logger.warning(f"Upstream request failed before the first token ({error}), retry {attempt}/{self.max_retries} in {retry_after:.2f}s")
+                await asyncio.sleep(retry_after)
+
+    async def _open(self, params: Dict[str, Any]) -> PrimedStream:
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+
+        stream = await self.client.chat.completions.create(**params)
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except BaseException:
+            await asyncio.shield(stream.close())
+            raise
+
+        self.streams_opened += 1
+        self._ttft.append(loop.time() - started_at)
+        return PrimedStream(stream, first)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        if isinstance(error, APIStatusError):
+            if error.status_code not in RETRYABLE_STATUS_CODES:
+                return None
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.retry_max_delay)
+                except ValueError:
+                    pass
+        elif not isinstance(error, (APIConnectionError, APITimeoutError, httpx.TransportError)):
+            return None
+
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    @staticmethod
+    def _retry_reason(error: Exception) -> str:
+        if isinstance(error, APIStatusError):
+            return str(error.status_code)
+        if isinstance(error, APITimeoutError):
+            return "timeout"
+        return "connection"
+
+
+upstream = UpstreamClient()
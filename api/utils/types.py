@@ -35,6 +35,9 @@ class ChatCompletionRequest(BaseModel):
     top_p: Optional[float] = 1.0
     frequency_penalty: Optional[float] = 0.0
     presence_penalty: Optional[float] = 0.0
+    stream: Optional[bool] = False
+    coalesce_ms: Optional[float] = None
+    session_id: Optional[str] = None
 
 
 class ChatCompletionChunkDelta(BaseModel):
@@ -42,6 +45,7 @@ class ChatCompletionChunkDelta(BaseModel):
     content: Optional[str] = None
     tool_calls: Optional[List[ToolCall]] = None
     command_output: Optional[str] = None
+    tool_call_id: Optional[str] = None
 
 
 class ChatCompletionChunkChoice(BaseModel):
@@ -56,3 +60,33 @@ class ChatCompletionChunk(BaseModel):
     created: int
     model: str
     choices: List[ChatCompletionChunkChoice]
+
+
+class CommandExecution(BaseModel):
+    tool_call_id: Optional[str] = None
+    command: Optional[str] = None
+    exit_code: Optional[int] = None
+    stdout: str = ""
+    stderr: str = ""
+
+
+class CompletionUsage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
+
+class ChatCompletionChoice(BaseModel):
+    index: int
+    message: ChatCompletionMessageParam
+    finish_reason: Optional[str] = None
+
+
+class ChatCompletion(BaseModel):
+    id: str
+    object: str = "chat.completion"
+    created: int
+    model: str
+    choices: List[ChatCompletionChoice]
+    usage: CompletionUsage
+    commands: List[CommandExecution] = []
@@ -0,0 +1,368 @@
+import sys
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from typing import List, Dict, Any, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import httpx
+import psutil
+import uvicorn
+
+from benchmarks import mock_llm, mock_ssh
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class MockBackends:
+    def __init__(self, script: mock_llm.MockLLMScript, behaviour: mock_ssh.MockSSHBehaviour):
+        self.script = script
+        self.behaviour = behaviour
+        self.llm_port = free_port()
+        self.ssh_port = free_port()
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="mock-backends", daemon=True)
+        self.ready = threading.Event()
+        self.llm_server: Optional[uvicorn.Server] = None
+        self.ssh_server = None
+        self.error: Optional[BaseException] = None
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._serve())
+
+    async def _serve(self) -> None:
+        try:
+            self.ssh_server = await mock_ssh.start_mock_ssh(self.behaviour, port=self.ssh_port)
+            config = uvicorn.Config(
+                mock_llm.create_mock_llm(self.script),
+                host="127.0.0.1",
+                port=self.llm_port,
+                log_level="warning",
+                lifespan="off"
+            )
+            self.llm_server = uvicorn.Server(config)
+            serving = asyncio.create_task(self.llm_server.serve())
+            while not self.llm_server.started and not serving.done():
+                await asyncio.sleep(0.01)
+        except BaseException as error:
+            self.error = error
+            self.ready.set()
+            return
+
+        self.ready.set()
+        await serving
+        self.ssh_server.close()
+
+    def start(self) -> None:
+        self.thread.start()
+        self.ready.wait(30)
+        if self.error:
+            raise RuntimeError(f"Mock backends failed to start: {self.error}")
+
+    def reset_counters(self) -> None:
+        self.script.requests = self.script.tool_calls_sent = 0
+        self.behaviour.commands = self.behaviour.signalled = 0
+
+    def stop(self) -> None:
+        if self.llm_server:
+            self.llm_server.should_exit = True
+        self.thread.join(10)
+
+
+class GatewayProcess:
+    def __init__(self, llm_port: int, ssh_port: int, extra_env: Dict[str, str], work_dir: str):
+        self.port = free_port()
+        self.work_dir = work_dir
+        self.output_path = os.path.join(work_dir, "server.out")
+
+        self.env = dict(os.environ)
+        self.env.update({
+            "OPENROUTER_API_KEY": "benchmark",
+            "OPENROUTER_BASE_URL": f"http://127.0.0.1:{llm_port}",
+            "OPENROUTER_MODEL": "mock/benchmark",
+            "SSH_HOST": "127.0.0.1",
+            "SSH_PORT": str(ssh_port),
+            "SSH_USERNAME": "root",
+            "SSH_PASSWORD": "benchmark",
+            "SANDBOX_POOL_ENABLED": "False",
+            "LOG_LEVEL": "WARNING",
+            "LOG_FILE": os.path.join(work_dir, "server.log"),
+            "AUDIT_LOG_FILE": os.path.join(work_dir, "audit.jsonl"),
+            "BATCH_DIR": os.path.join(work_dir, "batches"),
+            "HOST_SHARED_DATA_PATH": os.path.join(work_dir, "shared_data"),
+        })
+        self.env.update(extra_env)
+
+        self.process: Optional[subprocess.Popen] = None
+        self.handle: Optional[psutil.Process] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self, timeout: float = 30.0) -> None:
+        output = open(self.output_path, "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=ROOT_DIR,
+            env=self.env,
+            stdout=output,
+            stderr=subprocess.STDOUT
+        )
+        self.handle = psutil.Process(self.process.pid)
+
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    break
+                try:
+                    response = await client.get(f"{self.base_url}/v1/status", timeout=1.0)
+                    if response.status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.1)
+
+        self.stop()
+        raise RuntimeError(f"Gateway did not become ready, see {self.output_path}")
+
+    def stop(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class ResourceSampler:
+    def __init__(self, handle: psutil.Process, interval: float = 0.1):
+        self.handle = handle
+        self.interval = interval
+        self.rss_samples: List[int] = []
+        self.cpu_started: float = 0.0
+        self.cpu_seconds: float = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    def _cpu(self) -> float:
+        times = self.handle.cpu_times()
+        return times.user + times.system
+
+    async def _sample(self) -> None:
+        while True:
+            self.rss_samples.append(self.handle.memory_info().rss)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self.cpu_started = self._cpu()
+        self.task = asyncio.create_task(self._sample())
+
+    async def stop(self) -> None:
+        self.cpu_seconds = self._cpu() - self.cpu_started
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+
+async def run_request(client: httpx.AsyncClient, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    started_at = time.perf_counter()
+    result = {"ttfb": None, "latency": None, "chunks": 0, "bytes": 0, "error": None, "done": False}
+
+    try:
+        async with client.stream("POST", url, json=payload) as response:
+            if response.status_code != 200:
+                await response.aread()
+                result["error"] = f"HTTP {response.status_code}"
+                return result
+
+            if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                async for data in response.aiter_bytes():
+                    if result["ttfb"] is None:
+                        result["ttfb"] = time.perf_counter() - started_at
+                    result["bytes"] += len(data)
+                result["chunks"] = 1
+                result["done"] = True
+                result["latency"] = time.perf_counter() - started_at
+                return result
+
+            async for line in response.aiter_lines():
+                if result["ttfb"] is None:
+                    result["ttfb"] = time.perf_counter() - started_at
+                result["bytes"] += len(line) + 1
+                if not line.startswith("data: "):
+                    continue
+                if line == "data: [DONE]":
+                    result["done"] = True
+                else:
+                    result["chunks"] += 1
+    except httpx.HTTPError as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+
+    result["latency"] = time.perf_counter() - started_at
+    if not result["error"] and not result["done"]:
+        result["error"] = "stream ended without [DONE]"
+    return result
+
+
+async def run_load(base_url: str, payload: Dict[str, Any], requests: int, concurrency: int) -> List[Dict[str, Any]]:
+    url = f"{base_url}/v1/chat/completions"
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(300.0, connect=10.0)) as client:
+        async def limited() -> Dict[str, Any]:
+            async with semaphore:
+                return await run_request(client, url, payload)
+
+        return await asyncio.gather(*(limited() for _ in range(requests)))
+
+
+def summarize(results: List[Dict[str, Any]], wall_time: float, sampler: ResourceSampler, backends: MockBackends) -> Dict[str, Any]:
+    succeeded = [result for result in results if not result["error"]]
+    latencies = [result["latency"] * 1000 for result in succeeded]
+    ttfbs = [result["ttfb"] * 1000 for result in succeeded if result["ttfb"] is not None]
+    chunks = sum(result["chunks"] for result in succeeded)
+    errors: Dict[str, int] = {}
+    for result in results:
+        if result["error"]:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+
+    def distribution(values: List[float]) -> Dict[str, float]:
+        return {
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+            "max": max(values) if values else 0.0
+        }
+
+    return {
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "errors": errors,
+        "wall_time_s": wall_time,
+        "requests_per_s": len(succeeded) / wall_time if wall_time else 0.0,
+        "latency_ms": distribution(latencies),
+        "ttfb_ms": distribution(ttfbs),
+        "chunks": chunks,
+        "chunks_per_s": chunks / wall_time if wall_time else 0.0,
+        "server_cpu_s": sampler.cpu_seconds,
+        "server_cpu_percent": sampler.cpu_seconds / wall_time * 100 if wall_time else 0.0,
+        "server_rss_mb": {
+            "start": sampler.rss_samples[0] / 2 ** 20 if sampler.rss_samples else 0.0,
+            "peak": max(sampler.rss_samples) / 2 ** 20 if sampler.rss_samples else 0.0
+        },
+        "mock_llm": backends.script.stats(),
+        "mock_ssh": backends.behaviour.stats()
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Requests:     {report['succeeded']}/{report['requests']} ok in {report['wall_time_s']:.2f}s ({report['requests_per_s']:.1f} req/s)")
+    for error, count in report["errors"].items():
+        print(f"  error x{count}: {error}")
+
+    for label, key in (("Latency", "latency_ms"), ("TTFB", "ttfb_ms")):
+        values = report[key]
+        print(f"{label + ':':<13} p50 {values['p50']:>9.1f} ms  p95 {values['p95']:>9.1f} ms  p99 {values['p99']:>9.1f} ms  max {values['max']:>9.1f} ms")
+
+    print(f"Chunks:       {report['chunks']} ({report['chunks_per_s']:,.0f} chunks/s)")
+    print(f"Server CPU:   {report['server_cpu_s']:.2f}s ({report['server_cpu_percent']:.1f}% of one core)")
+    print(f"Server RSS:   {report['server_rss_mb']['start']:.1f} MB at start, {report['server_rss_mb']['peak']:.1f} MB peak")
+    print(f"Mock LLM:     {report['mock_llm']['requests']} completions, {report['mock_llm']['tool_calls']} tool calls")
+    print(f"Mock SSH:     {report['mock_ssh']['connections']} connections, {report['mock_ssh']['commands']} commands")
+
+
+def parse_env(pairs: List[str]) -> Dict[str, str]:
+    env = {}
+    for pair in pairs:
+        key, separator, value = pair.partition("=")
+        if not separator:
+            raise SystemExit(f"--env expects KEY=VALUE, got {pair!r}")
+        env[key.upper()] = value
+    return env
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    backends = MockBackends(mock_llm.script_from_arguments(args), mock_ssh.behaviour_from_arguments(args))
+    backends.start()
+
+    work_dir = tempfile.mkdtemp(prefix="interactive-ai-bench-")
+    gateway = GatewayProcess(backends.llm_port, backends.ssh_port, parse_env(args.env), work_dir)
+
+    payload: Dict[str, Any] = {
+        "messages": [{"role": "user", "content": "Run the benchmark command and summarize the output."}],
+        "stream": not args.non_streaming
+    }
+    if args.coalesce_ms is not None:
+        payload["coalesce_ms"] = args.coalesce_ms
+
+    try:
+        await gateway.start()
+        print(f"Gateway {gateway.base_url} (pid {gateway.process.pid}), mock LLM :{backends.llm_port}, mock SSH :{backends.ssh_port}")
+        print(f"Logs in {work_dir}\n")
+
+        if args.warmup:
+            await run_load(gateway.base_url, payload, args.warmup, min(args.warmup, args.concurrency))
+            backends.reset_counters()
+
+        sampler = ResourceSampler(gateway.handle)
+        sampler.start()
+        started_at = time.perf_counter()
+        results = await run_load(gateway.base_url, payload, args.requests, args.concurrency)
+        wall_time = time.perf_counter() - started_at
+        await sampler.stop()
+
+        return summarize(results, wall_time, sampler, backends)
+    finally:
+        gateway.stop()
+        backends.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test of /v1/chat/completions against a mock LLM and SSH server")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5, help="Requests sent before measuring")
+    parser.add_argument("--non-streaming", action="store_true", help="Send stream=false and time the aggregated JSON response")
+    parser.add_argument("--coalesce-ms", type=float, default=None, help="Forwarded as the coalesce_ms request field")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra gateway settings, e.g. --env SSH_POOL_MAX_SIZE=20")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report to this file")
+    mock_llm.add_arguments(parser)
+    mock_ssh.add_arguments(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w") as file:
+            json.dump({"arguments": vars(args), "report": report}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import sys
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from typing import AsyncGenerator, Dict, Any, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, JSONResponse
+
+
+WORDS = ["The", " command", " finished", " and", " the", " output", " looks", " fine", ".", "\n"]
+
+
+class MockLLMScript:
+    def __init__(
+        self,
+        ttft_ms: float = 100.0,
+        token_rate: float = 200.0,
+        tokens: int = 50,
+        tool_steps: int = 2,
+        tool_calls_per_step: int = 1,
+        command: str = "bench-run",
+        argument_fragments: int = 4
+    ):
+        self.ttft = ttft_ms / 1000
+        self.token_interval = 1 / token_rate if token_rate > 0 else 0.0
+        self.tokens = tokens
+        self.tool_steps = tool_steps
+        self.tool_calls_per_step = tool_calls_per_step
+        self.command = command
+        self.argument_fragments = max(1, argument_fragments)
+
+        self.requests = 0
+        self.tool_calls_sent = 0
+
+    def completed_steps(self, messages: List[Dict[str, Any]]) -> int:
+        steps = 0
+        for message in reversed(messages):
+            role = message.get("role")
+            if role == "user":
+                break
+            if role == "assistant" and message.get("tool_calls"):
+                steps += 1
+        return steps
+
+    async def stream(self, body: Dict[str, Any]) -> AsyncGenerator[str, None]:
+        self.requests += 1
+        chunk_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "mock/model")
+        step = self.completed_steps(body.get("messages", []))
+        wants_tools = step < self.tool_steps and body.get("tools")
+
+        def frame(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            payload = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        await asyncio.sleep(self.ttft)
+
+        yield frame({"role": "assistant", "content": ""})
+
+        token_count = self.tokens if not wants_tools else min(self.tokens, 5)
+        for index in range(token_count):
+            yield frame({"content": WORDS[index % len(WORDS)]})
+            if self.token_interval:
+                await asyncio.sleep(self.token_interval)
+
+        if wants_tools:
+            for call_index in range(self.tool_calls_per_step):
+                self.tool_calls_sent += 1
+                arguments = json.dumps({"command": f"{self.command} --step {step} --call {call_index}"})
+                size = -(-len(arguments) // self.argument_fragments)
+                fragments = [arguments[offset:offset + size] for offset in range(0, len(arguments), size)]
+
+                yield frame({"tool_calls": [{
+                    "index": call_index,
+                    "id": f"call_{uuid.uuid4().hex[:16]}",
+                    "type": "function",
+                    "function": {"name": "execute_ssh_command", "arguments": fragments[0]}
+                }]})
+                for fragment in fragments[1:]:
+                    if self.token_interval:
+                        await asyncio.sleep(self.token_interval)
+                    yield frame({"tool_calls": [{"index": call_index, "function": {"arguments": fragment}}]})
+
+            yield frame({}, "tool_calls")
+        else:
+            yield frame({}, "stop")
+
+        prompt_tokens = sum(len(str(message.get("content") or "")) for message in body.get("messages", [])) // 4
+        usage = {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": token_count, "total_tokens": prompt_tokens + token_count}
+        }
+        yield f"data: {json.dumps(usage)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "tool_calls": self.tool_calls_sent}
+
+
+def create_mock_llm(script: MockLLMScript) -> FastAPI:
+    application = FastAPI(title="Mock LLM")
+
+    @application.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if not body.get("stream"):
+            return JSONResponse(status_code=400, content={"error": {"message": "mock only supports stream=true"}})
+        return StreamingResponse(script.stream(body), media_type="text/event-stream")
+
+    @application.get("/stats")
+    async def stats():
+        return script.stats()
+
+    return application
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--ttft-ms", type=float, default=100.0, help="Delay before the first streamed chunk")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Streamed content tokens per second")
+    parser.add_argument("--tokens", type=int, default=50, help="Content tokens in the final answer")
+    parser.add_argument("--tool-steps", type=int, default=2, help="Agent steps that end in tool calls before the final answer")
+    parser.add_argument("--tool-calls-per-step", type=int, default=1)
+
+
+def script_from_arguments(args: argparse.Namespace) -> MockLLMScript:
+    return MockLLMScript(
+        ttft_ms=args.ttft_ms,
+        token_rate=args.token_rate,
+        tokens=args.tokens,
+        tool_steps=args.tool_steps,
+        tool_calls_per_step=args.tool_calls_per_step
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible streaming stand-in with scripted tool calls")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8899)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(create_mock_llm(script_from_arguments(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import sys
+import os
+import asyncio
+import argparse
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncssh
+
+
+class MockSSHBehaviour:
+    def __init__(self, latency_ms: float = 50.0, output_bytes: int = 4096, chunk_size: int = 1024, stderr_bytes: int = 0):
+        self.latency = latency_ms / 1000
+        self.output_bytes = output_bytes
+        self.chunk_size = max(1, chunk_size)
+        self.stderr_bytes = stderr_bytes
+
+        line = "x" * 79 + "\n"
+        self.output = (line * (output_bytes // len(line) + 1))[:output_bytes]
+        self.error_output = ("e" * 79 + "\n") * (stderr_bytes // 80 + 1)
+
+        self.connections = 0
+        self.commands = 0
+        self.signalled = 0
+
+    async def handle(self, process: asyncssh.SSHServerProcess) -> None:
+        self.commands += 1
+        work = asyncio.ensure_future(self._produce(process))
+        watcher = asyncio.ensure_future(self._wait_for_signal(process))
+
+        done, _ = await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if work in done:
+            watcher.cancel()
+            process.exit(0 if work.exception() is None else 1)
+        else:
+            work.cancel()
+            self.signalled += 1
+            process.exit(130)
+
+    async def _produce(self, process: asyncssh.SSHServerProcess) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        for offset in range(0, self.output_bytes, self.chunk_size):
+            process.stdout.write(self.output[offset:offset + self.chunk_size])
+            await process.stdout.drain()
+
+        if self.stderr_bytes:
+            process.stderr.write(self.error_output[:self.stderr_bytes])
+
+    @staticmethod
+    async def _wait_for_signal(process: asyncssh.SSHServerProcess) -> None:
+        try:
+            while await process.stdin.read(4096):
+                pass
+        except (asyncssh.SignalReceived, asyncssh.BreakReceived):
+            return
+        except (asyncssh.TerminalSizeChanged, BrokenPipeError, ConnectionError):
+            pass
+        await asyncio.Event().wait()
+
+    def stats(self) -> Dict[str, int]:
+        return {"connections": self.connections, "commands": self.commands, "signalled": self.signalled}
+
+
+class _MockSSHServer(asyncssh.SSHServer):
+    def __init__(self, behaviour: MockSSHBehaviour):
+        self.behaviour = behaviour
+
+    def connection_made(self, connection: asyncssh.SSHServerConnection) -> None:
+        self.behaviour.connections += 1
+
+    def begin_auth(self, username: str) -> bool:
+        return True
+
+    def password_auth_supported(self) -> bool:
+        return True
+
+    def validate_password(self, username: str, password: str) -> bool:
+        return True
+
+
+async def start_mock_ssh(behaviour: MockSSHBehaviour, host: str = "127.0.0.1", port: int = 0, host_key: Optional[asyncssh.SSHKey] = None) -> asyncssh.SSHAcceptor:
+    key = host_key or asyncssh.generate_private_key("ssh-ed25519")
+    return await asyncssh.create_server(
+        lambda: _MockSSHServer(behaviour),
+        host,
+        port,
+        server_host_keys=[key],
+        process_factory=behaviour.handle,
+        encoding="utf-8"
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--command-latency-ms", type=float, default=50.0, help="Delay before a command produces output")
+    parser.add_argument("--output-bytes", type=int, default=4096, help="Stdout bytes produced per command")
+    parser.add_argument("--output-chunk-size", type=int, default=1024, help="Bytes per stdout write")
+
+
+def behaviour_from_arguments(args: argparse.Namespace) -> MockSSHBehaviour:
+    return MockSSHBehaviour(
+        latency_ms=args.command_latency_ms,
+        output_bytes=args.output_bytes,
+        chunk_size=args.output_chunk_size
+    )
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = await start_mock_ssh(behaviour_from_arguments(args), args.host, args.port)
+    print(f"Mock SSH server listening on {args.host}:{args.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSH server stand-in with configurable command latency and output size")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2299)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import sys
+import os
+import time
+import uuid
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.api.v1.responses import ChunkSerializer, create_sse_event
+from api.utils.types import ChatCompletionChunk, ChatCompletionChunkChoice, ChatCompletionChunkDelta, Role
+
+
+SAMPLE_CONTENT = ["Hello", " world", "! Ünïcødé ✓", " \"quoted\"\n\ttabs\\", "", " " * 3, "🚀 emoji"]
+SAMPLE_COMMAND_OUTPUT = ["> ls -la /root/data", "| total 4\n", "< drwxr-xr-x 2 root root 4096 .\n\x1b[0m"]
+
+
+def pydantic_chunk(req_id: str, created: int, model: str, content: str = None, command_output: str = None, tool_call_id: str = None) -> str:
+    delta = ChatCompletionChunkDelta(
+        role=Role.ASSISTANT if content else None,
+        content=content,
+        command_output=command_output,
+        tool_call_id=tool_call_id
+    )
+    chunk = ChatCompletionChunk(
+        id=req_id, created=created, model=model,
+        choices=[ChatCompletionChunkChoice(index=0, delta=delta)]
+    )
+    return create_sse_event(chunk)
+
+
+def verify(req_id: str, created: int, model: str) -> None:
+    serializer = ChunkSerializer(req_id, created, model)
+
+    for text in SAMPLE_CONTENT:
+        if text:
+            assert serializer.content(text) == pydantic_chunk(req_id, created, model, content=text), text
+
+    for text in SAMPLE_COMMAND_OUTPUT:
+        assert serializer.command_output(text) == pydantic_chunk(req_id, created, model, command_output=text), text
+        assert serializer.command_output(text, "call_1") == pydantic_chunk(req_id, created, model, command_output=text, tool_call_id="call_1"), text
+
+
+def measure(label: str, function, iterations: int) -> float:
+    started_at = time.perf_counter()
+    for index in range(iterations):
+        function(index)
+    elapsed = time.perf_counter() - started_at
+
+    print(f"{label:<28} {iterations / elapsed:>14,.0f} chunks/s {elapsed / iterations * 1e6:>10.2f} us/chunk")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Pydantic and pre-templated SSE chunk serialization")
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    req_id = f"chatcmpl-{uuid.uuid4()}"
+    created = int(time.time())
+    model = "google/gemini-3-flash-preview"
+
+    verify(req_id, created, model)
+    print("Output check: byte-identical\n")
+
+    serializer = ChunkSerializer(req_id, created, model)
+    tokens = [text for text in SAMPLE_CONTENT if text]
+
+    baseline = measure("pydantic content", lambda i: pydantic_chunk(req_id, created, model, content=tokens[i % len(tokens)]), args.iterations)
+    fast = measure("templated content", lambda i: serializer.content(tokens[i % len(tokens)]), args.iterations)
+    print(f"{'speedup':<28} {baseline / fast:>14.1f}x\n")
+
+    baseline = measure("pydantic command_output", lambda i: pydantic_chunk(req_id, created, model, command_output=SAMPLE_COMMAND_OUTPUT[i % 3], tool_call_id="call_1"), args.iterations)
+    fast = measure("templated command_output", lambda i: serializer.command_output(SAMPLE_COMMAND_OUTPUT[i % 3], "call_1"), args.iterations)
+    print(f"{'speedup':<28} {baseline / fast:>14.1f}x")
+
+
+if __name__ == "__main__":
+    main()
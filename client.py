@@ -2,8 +2,9 @@ import asyncio
 import json
 import sys
 import os
+import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 import httpx
 import questionary
@@ -14,6 +15,7 @@ from rich.console import Console, Group
 from rich.live import Live
 from rich.markdown import Markdown
 from rich.panel import Panel
+from rich.segment import Segment, SegmentLines
 from rich.spinner import Spinner
 from rich.text import Text
 from rich.theme import Theme
@@ -21,9 +23,15 @@ from rich.table import Table
 
 
 API_URL = "http://localhost:8888/v1/chat/completions"
-HISTORY_FILE = Path("chat_history.json")
+SESSIONS_URL = "http://localhost:8888/v1/sessions"
+HISTORY_FILE = Path("chat_history.jsonl")
+LEGACY_HISTORY_FILE = Path("chat_history.json")
+HISTORY_READ_BLOCK = 64 * 1024
 CONFIG_FILE = Path("client_config.json")
 CMD_HISTORY_FILE = ".cmd_history"
+STREAMED_OUTPUT_TAIL = 4096
+STREAMED_OUTPUT_LINES = 15
+RENDER_FPS = 10
 
 
 COLOR_PRIMARY = "#00BFFF"
@@ -53,7 +61,8 @@ class ConfigurationManager:
         self.default_config = {
             "model": "google/gemini-3-flash-preview",
             "show_command_output": True,
-            "max_history": 50
+            "max_history": 50,
+            "coalesce_ms": 30
         }
         self.config = self.load_config()
 
@@ -76,37 +85,179 @@ class ConfigurationManager:
 
 
 class HistoryManager:
-    def __init__(self):
+    def __init__(self, max_entries: int = 50):
+        self.max_entries = max(max_entries, 1)
         self.history: List[Dict[str, str]] = []
+        self.appended_since_compaction = 0
 
     def load_history(self):
-        if HISTORY_FILE.exists():
-            try:
-                with open(HISTORY_FILE, "r") as file:
-                    self.history = json.load(file)
-            except Exception:
-                self.history = []
+        self._migrate_legacy_history()
 
-    def save_history(self):
-        with open(HISTORY_FILE, "w") as file:
-            json.dump(self.history, file, indent=4)
+        if not HISTORY_FILE.exists():
+            self.history = []
+            return
+
+        try:
+            self.history, truncated = self._read_tail(self.max_entries)
+        except Exception:
+            self.history, truncated = [], False
+
+        if truncated:
+            self.compact()
 
     def add_message(self, role: str, content: str):
-        self.history.append({"role": role, "content": content})
-        self.save_history()
+        entry = {"role": role, "content": content}
+        self.history.append(entry)
+
+        with open(HISTORY_FILE, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        self.appended_since_compaction += 1
+        if len(self.history) > self.max_entries:
+            self.history = self.history[-self.max_entries:]
+        if self.appended_since_compaction >= self.max_entries:
+            self.compact()
+
+    def compact(self):
+        temporary_file = HISTORY_FILE.with_suffix(".tmp")
+        with open(temporary_file, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.history)
+        os.replace(temporary_file, HISTORY_FILE)
+        self.appended_since_compaction = 0
 
     def clear(self):
         self.history = []
-        self.save_history()
+        self.compact()
+
+    def tail_for_screen(self, height: int) -> List[Dict[str, str]]:
+        visible_lines = 0
+        start = len(self.history)
+        while start > 0 and visible_lines < height:
+            start -= 1
+            visible_lines += self.history[start]["content"].count("\n") + 3
+        return self.history[start:]
+
+    @staticmethod
+    def _read_tail(limit: int):
+        with open(HISTORY_FILE, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            position = file.tell()
+            buffer = b""
+
+            while position > 0 and buffer.count(b"\n") <= limit:
+                read_size = min(HISTORY_READ_BLOCK, position)
+                position -= read_size
+                file.seek(position)
+                buffer = file.read(read_size) + buffer
+
+        lines = buffer.splitlines()
+        if position > 0:
+            lines = lines[1:]
+
+        entries = []
+        for line in lines[-limit:]:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+
+        return entries, position > 0 or len(lines) > limit
+
+    def _migrate_legacy_history(self):
+        if HISTORY_FILE.exists() or not LEGACY_HISTORY_FILE.exists():
+            return
+
+        try:
+            with open(LEGACY_HISTORY_FILE, "r") as file:
+                self.history = json.load(file)[-self.max_entries:]
+            self.compact()
+            LEGACY_HISTORY_FILE.rename(LEGACY_HISTORY_FILE.with_suffix(".json.bak"))
+        except Exception:
+            self.history = []
+
+
+class StreamingMarkdown:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = max(height, 5)
+        self.options = console.options.update_width(width)
+
+        self.text_parts: List[str] = []
+        self.overflowed = False
+        self.last_render = 0.0
+
+        self._rendered_lines: List[List[Segment]] = []
+        self._block_lines: List[str] = []
+        self._partial_line = ""
+        self._in_fence = False
+        self._tail_text = ""
+
+    @property
+    def text(self) -> str:
+        return "".join(self.text_parts)
+
+    def append(self, chunk: str):
+        self.text_parts.append(chunk)
+
+        if self.overflowed:
+            self._tail_text = (self._tail_text + chunk)[-self.width * self.height:]
+            return
+
+        lines = (self._partial_line + chunk).split("\n")
+        self._partial_line = lines.pop()
+
+        for line in lines:
+            if line.lstrip().startswith("```"):
+                self._in_fence = not self._in_fence
+
+            if not self._in_fence and not line.strip():
+                self._complete_block()
+            else:
+                self._block_lines.append(line)
+
+    def should_render(self) -> bool:
+        now = time.monotonic()
+        if now - self.last_render < 1 / RENDER_FPS:
+            return False
+        self.last_render = now
+        return True
+
+    def renderable(self):
+        if not self.overflowed:
+            tail = "\n".join(self._block_lines + [self._partial_line])
+            tail_lines = console.render_lines(Markdown(tail), self.options, pad=False) if tail.strip() else []
+            separator = [[]] if self._rendered_lines and tail_lines else []
+            lines = self._rendered_lines + separator + tail_lines
+
+            if len(lines) <= self.height:
+                return SegmentLines(lines, new_lines=True)
+
+            self.overflowed = True
+            self._tail_text = self.text[-self.width * self.height:]
+
+        visible_lines = self._tail_text.splitlines()[-self.height:]
+        return Text("\n".join(visible_lines), style="ai.text")
+
+    def _complete_block(self):
+        if not self._block_lines:
+            return
+
+        block = "\n".join(self._block_lines)
+        self._block_lines = []
+
+        if self._rendered_lines:
+            self._rendered_lines.append([])
+        self._rendered_lines.extend(console.render_lines(Markdown(block), self.options, pad=False))
 
 
 class InteractiveAIClient:
     def __init__(self):
         self.config_manager = ConfigurationManager()
-        self.history_manager = HistoryManager()
+        self.history_manager = HistoryManager(self.config_manager.config["max_history"])
         self.history_manager.load_history()
         self.client = httpx.AsyncClient(timeout=120.0)
         self.input_history = FileHistory(CMD_HISTORY_FILE)
+        self.session_id: Optional[str] = None
 
     @staticmethod
     def _hard_clear():
@@ -133,18 +284,30 @@ class InteractiveAIClient:
         )
 
     @staticmethod
-    def _print_result_panel(content: str, width: int):
+    def _build_result_panel(content: str, width: int, title: str = "↳ RESULT") -> Panel:
         out_content = Text(content, style="cmd.result.text")
-        console.print(
-            Panel(
-                out_content,
-                title=f"[bold {COLOR_CMD_RESULT}]↳ RESULT[/]",
-                title_align="left",
-                border_style=COLOR_CMD_RESULT,
-                width=width,
-                padding=(0, 1),
-                style=f"on {COLOR_CMD_BG}"
-            )
+        return Panel(
+            out_content,
+            title=f"[bold {COLOR_CMD_RESULT}]{title}[/]",
+            title_align="left",
+            border_style=COLOR_CMD_RESULT,
+            width=width,
+            padding=(0, 1),
+            style=f"on {COLOR_CMD_BG}"
+        )
+
+    def _print_result_panel(self, content: str, width: int):
+        console.print(self._build_result_panel(content, width))
+
+    @staticmethod
+    def _build_ai_panel(renderable, width: int) -> Panel:
+        return Panel(
+            renderable,
+            title="[ai.header]Interactive AI[/ai.header]",
+            title_align="left",
+            border_style=COLOR_AI_BORDER,
+            width=width,
+            padding=(0, 1)
         )
 
     async def start(self):
@@ -183,6 +346,7 @@ class InteractiveAIClient:
                     await self._settings_menu()
                 elif choice == "Clear History":
                     self.history_manager.clear()
+                    await self._reset_session()
                     console.print("[bold green]History cleared[/bold green]")
                     await asyncio.sleep(0.4)
             except KeyboardInterrupt:
@@ -286,9 +450,8 @@ class InteractiveAIClient:
     async def _chat_session(self):
         self._hard_clear()
 
-        if self.history_manager.history:
-            for message in self.history_manager.history:
-                self._render_message(message["role"], message["content"])
+        for message in self.history_manager.tail_for_screen(console.size.height):
+            self._render_message(message["role"], message["content"])
 
         console.print(Panel(Align.center("[text.dim]Use ↑/↓ for history. Ctrl+C to exit.[/text.dim]"), border_style=COLOR_CMD_BG))
 
@@ -315,30 +478,70 @@ class InteractiveAIClient:
                 self._render_message("user", user_input)
                 self.history_manager.add_message("user", user_input)
 
-                payload = {
-                    "model": self.config_manager.config["model"],
-                    "messages": [message for message in self.history_manager.history if message["role"] in ["user", "assistant"]],
-                    "stream": True
-                }
-
-                await self._handle_streaming_response(payload)
+                await self._send_turn(user_input)
             except KeyboardInterrupt:
                 break
             except Exception as error:
                 console.print(f"\n[danger]Error: {str(error)}[/danger]")
 
-    async def _handle_streaming_response(self, payload: Dict):
-        full_response_text = ""
+    async def _create_session(self) -> str:
+        response = await self.client.post(SESSIONS_URL)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def _reset_session(self):
+        if self.session_id:
+            try:
+                await self.client.delete(f"{SESSIONS_URL}/{self.session_id}")
+            except httpx.HTTPError:
+                pass
+        self.session_id = None
+
+    async def _send_turn(self, user_input: str):
+        for _ in range(2):
+            if self.session_id:
+                messages = [{"role": "user", "content": user_input}]
+            else:
+                self.session_id = await self._create_session()
+                messages = [message for message in self.history_manager.history if message["role"] in ["user", "assistant"]]
+
+            payload = {
+                "model": self.config_manager.config["model"],
+                "session_id": self.session_id,
+                "messages": messages,
+                "stream": True
+            }
+
+            if self.config_manager.config["coalesce_ms"]:
+                payload["coalesce_ms"] = self.config_manager.config["coalesce_ms"]
+
+            if await self._handle_streaming_response(payload):
+                return
+
+            self.session_id = None
+
+    async def _handle_streaming_response(self, payload: Dict) -> bool:
+        streamed_outputs: Dict[str, str] = {}
         width = console.size.width
         max_panel_width = int(width * 0.8)
+        response_markdown = StreamingMarkdown(max_panel_width - 4, console.size.height - 4)
 
         with Live(Spinner("dots", text="Processing...", style="primary"), refresh_per_second=12, auto_refresh=True, transient=True) as live_display:
             try:
                 async with self.client.stream("POST", API_URL, json=payload) as response:
+                    if response.status_code == 404 and payload.get("session_id"):
+                        return False
+
+                    if response.status_code in (429, 503):
+                        live_display.stop()
+                        retry_after = response.headers.get("Retry-After", "a few")
+                        console.print(Panel(f"[accent]Server is busy, try again in {retry_after} seconds[/accent]", border_style="accent"))
+                        return True
+
                     if response.status_code != 200:
                         live_display.stop()
                         console.print(Panel(f"[danger]API Error {response.status_code}[/danger]", border_style="danger"))
-                        return
+                        return True
 
                     async for line in response.aiter_lines():
                         if not line.startswith("data: "):
@@ -354,19 +557,24 @@ class InteractiveAIClient:
                             content_chunk = delta.get("content")
 
                             if content_chunk:
-                                full_response_text += content_chunk
-                                live_panel = Panel(
-                                    Markdown(full_response_text),
-                                    title="[ai.header]Interactive AI[/ai.header]",
-                                    title_align="left",
-                                    border_style=COLOR_AI_BORDER,
-                                    width=max_panel_width,
-                                    padding=(0, 1)
-                                )
-                                live_display.update(Align.left(live_panel))
+                                response_markdown.append(content_chunk)
+                                if response_markdown.should_render():
+                                    live_display.update(Align.left(self._build_ai_panel(response_markdown.renderable(), max_panel_width)))
 
                             raw_cmd_output = delta.get("command_output")
                             if raw_cmd_output and self.config_manager.config["show_command_output"]:
+                                tool_call_id = delta.get("tool_call_id") or ""
+
+                                if raw_cmd_output.startswith("| "):
+                                    streamed_output = (streamed_outputs.get(tool_call_id, "") + raw_cmd_output[2:])[-STREAMED_OUTPUT_TAIL:]
+                                    streamed_outputs[tool_call_id] = streamed_output
+                                    live_display.update(Align.left(self._build_result_panel(
+                                        "\n".join(streamed_output.splitlines()[-STREAMED_OUTPUT_LINES:]),
+                                        max_panel_width,
+                                        title="↳ RUNNING"
+                                    )))
+                                    continue
+
                                 clean_output = raw_cmd_output.strip()
 
                                 live_display.stop()
@@ -376,21 +584,15 @@ class InteractiveAIClient:
                                     self._print_exec_panel(cmd_text, max_panel_width)
                                     self.history_manager.add_message("tool_exec", cmd_text)
                                 elif clean_output.startswith("< "):
+                                    streamed_outputs.pop(tool_call_id, None)
                                     res_text = clean_output[2:]
                                     self._print_result_panel(res_text, max_panel_width)
                                     self.history_manager.add_message("tool_result", res_text)
 
                                 live_display.start()
 
-                                if full_response_text:
-                                    live_display.update(Align.left(Panel(
-                                        Markdown(full_response_text),
-                                        title="[ai.header]Interactive AI[/ai.header]",
-                                        title_align="left",
-                                        border_style=COLOR_AI_BORDER,
-                                        width=max_panel_width,
-                                        padding=(0, 1)
-                                    )))
+                                if response_markdown.text_parts:
+                                    live_display.update(Align.left(self._build_ai_panel(response_markdown.renderable(), max_panel_width)))
                                 else:
                                     live_display.update(Spinner("dots", text="Processing...", style="primary"))
                         except json.JSONDecodeError:
@@ -400,22 +602,17 @@ class InteractiveAIClient:
             except Exception as error:
                 live_display.stop()
                 console.print(Panel(f"[danger]Stream Error: {error}[/danger]", border_style="danger"))
-                return
+                return True
 
+        full_response_text = response_markdown.text
         if full_response_text:
             self.history_manager.add_message("assistant", full_response_text)
 
-            final_panel = Panel(
-                Markdown(full_response_text),
-                title="[ai.header]Interactive AI[/ai.header]",
-                title_align="left",
-                border_style=COLOR_AI_BORDER,
-                width=max_panel_width,
-                padding=(0, 1)
-            )
-            console.print(Align.left(final_panel))
+            console.print(Align.left(self._build_ai_panel(Markdown(full_response_text), max_panel_width)))
             console.print()
 
+        return True
+
 
 if __name__ == "__main__":
     client = InteractiveAIClient()
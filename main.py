@@ -4,21 +4,49 @@ import os
 sys.dont_write_bytecode = True
 os.environ["PYTHONDONTWRITEBYTECODE"] = "1"
 
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from api.api.metrics import metrics_router
 from api.api.router import api_router
 from api.config.settings import settings
+from api.core.audit import audit_log
+from api.core.batch_scheduler import batch_scheduler
+from api.core.file_index import file_index
+from api.core.sandbox_pool import sandbox_pool
+from api.core.ssh_executor import ssh_pool
+from api.core.upstream import upstream
 from api.utils.logger import setup_logging
 
 
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    audit_log.start()
+    if sandbox_pool.enabled:
+        await sandbox_pool.start()
+    else:
+        await ssh_pool.start()
+    await batch_scheduler.start()
+    await file_index.start()
+    yield
+    await file_index.close()
+    await batch_scheduler.close()
+    await sandbox_pool.close()
+    await ssh_pool.close()
+    await upstream.close()
+    await audit_log.close()
+
+
 def create_application() -> FastAPI:
     setup_logging()
 
     application = FastAPI(
         title="Interactive AI API",
-        version="2.0.0"
+        version="2.0.0",
+        lifespan=lifespan
     )
 
     application.add_middleware(
@@ -31,6 +59,9 @@ def create_application() -> FastAPI:
 
     application.include_router(api_router)
 
+    if settings.metrics_enabled:
+        application.include_router(metrics_router)
+
     return application
 
 
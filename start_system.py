@@ -8,6 +8,16 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def launch_backend(container_name):
+    print("Starting FastAPI Backend...")
+    try:
+        subprocess.run([sys.executable, "main.py"], check=True)
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+        if container_name:
+            subprocess.run(f"docker stop {container_name}", shell=True)
+
+
 def main():
     ssh_port = os.getenv("SSH_PORT", "2222")
     ssh_password = os.getenv("SSH_PASSWORD", "Pa55w0rd!")
@@ -15,6 +25,11 @@ def main():
 
     print(f"--- Interactive AI Launcher ---")
 
+    if os.getenv("SANDBOX_POOL_ENABLED", "False").lower() in ("1", "true", "yes"):
+        print("Sandbox pool enabled, containers are managed by the backend")
+        launch_backend(container_name=None)
+        return
+
     print("Stopping existing containers...")
     subprocess.run("docker rm -f interactive-ai-container", shell=True, stderr=subprocess.DEVNULL)
 
@@ -34,12 +49,7 @@ def main():
     print("Waiting for SSH to initialize...")
     time.sleep(3)
 
-    print("Starting FastAPI Backend...")
-    try:
-        subprocess.run([sys.executable, "main.py"], check=True)
-    except KeyboardInterrupt:
-        print("\nShutting down...")
-        subprocess.run("docker stop interactive-ai-container", shell=True)
+    launch_backend(container_name="interactive-ai-container")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+import os
+
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("SSH_PASSWORD", "test")
+
+from api.core.session_store import SessionStore
+
+
+def tool_turn(index):
+    return [
+        {"role": "assistant", "content": None, "tool_calls": [{"id": f"call_{index}", "type": "function"}]},
+        {"role": "tool", "tool_call_id": f"call_{index}", "content": "EXIT: 0"}
+    ]
+
+
+def make_store(max_messages):
+    store = SessionStore()
+    store.max_messages = max_messages
+    return store
+
+
+def test_trim_keeps_window_starting_at_user_message():
+    store = make_store(4)
+    messages = [{"role": "user", "content": "first"}, *tool_turn(0), {"role": "user", "content": "second"}, *tool_turn(1)]
+
+    assert store._trim(messages) == messages[3:]
+
+
+def test_trim_falls_back_to_last_user_turn_when_window_is_all_tool_output():
+    store = make_store(4)
+    tool_output = [message for index in range(5) for message in tool_turn(index)]
+    messages = [{"role": "user", "content": "run it"}, *tool_output]
+
+    trimmed = store._trim(messages)
+
+    assert trimmed[0] == {"role": "user", "content": "run it"}
+    assert trimmed == messages
+
+
+def test_trim_without_any_user_message_drops_history():
+    store = make_store(2)
+    messages = [message for index in range(3) for message in tool_turn(index)]
+
+    assert store._trim(messages) == []